@@ -1,10 +1,87 @@
 __author__ = "Richard Correro (richard@richardcorrero.com)"
 
 
+import importlib
+from typing import Any, Dict, List
+
 from .data import *
-from .parallelizer import *
+from .parallelizer import CallSpec, Parallelizer, Task
 from .transformer import *
 
+# Everything else is imported on first access so that `import light_pipe`
+# stays cheap for CLI tools and short-lived worker processes.
+_LAZY_ATTRS: Dict[str, str] = {
+    "AutoParallelizer": ".auto",
+    "DeadLetter": ".deadletters",
+    "DeadLetterStore": ".deadletters",
+    "FileDeadLetterStore": ".deadletters",
+    "MemoryDeadLetterStore": ".deadletters",
+    "SQLiteDeadLetterStore": ".deadletters",
+    "DistributedParallelizer": ".distributed",
+    "run_worker": ".distributed",
+    "BloomFilter": ".filters",
+    "Dedup": ".filters",
+    "ExactIndex": ".filters",
+    "Filter": ".filters",
+    "make_filter": ".filters",
+    "AsyncGatherer": ".gatherer",
+    "QueueEmptySignal": ".gatherer",
+    "AsyncProcessPooler": ".hybrid",
+    "MemoryBudget": ".memory",
+    "Metrics": ".metrics",
+    "BlockingPooler": ".pooler",
+    "BlockingProcessPooler": ".pooler",
+    "BlockingThreadPooler": ".pooler",
+    "Pooler": ".pooler",
+    "ProcessPooler": ".pooler",
+    "ThreadPooler": ".pooler",
+    "PoolRegistry": ".pools",
+    "default_registry": ".pools",
+    "get_pool": ".pools",
+    "register_pool": ".pools",
+    "shutdown_pools": ".pools",
+    "warm_up_pools": ".pools",
+    "ResourceBinding": ".resources",
+    "release_resources": ".resources",
+    "Scheduler": ".scheduler",
+    "SchedulerClient": ".scheduler",
+    "FileSink": ".sinks",
+    "SQLiteSink": ".sinks",
+    "Sink": ".sinks",
+    "make_sink": ".sinks",
+    "ExternalSort": ".sort",
+    "iter_jsonl": ".sources",
+    "iter_lines": ".sources",
+    "iter_records": ".sources",
+    "read_glob": ".sources",
+    "read_jsonl": ".sources",
+    "read_lines": ".sources",
+    "read_records": ".sources",
+    "split_file": ".sources",
+    "CountWindow": ".windows",
+    "TimeWindow": ".windows",
+    "WindowResult": ".windows",
+}
+
+__all__: List[str] = [
+    "Data", "make_data", "CallSpec", "Parallelizer", "Task", "Transformer",
+    "StreamTransformer", "make_transformer", *_LAZY_ATTRS
+]
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_ATTRS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value: Any = getattr(
+        importlib.import_module(_LAZY_ATTRS[name], __name__), name
+    )
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted({*globals(), *_LAZY_ATTRS})
+
 __doc__ = """
 # [Light-Pipe](https://github.com/rcorrero/light-pipe)
 
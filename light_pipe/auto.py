@@ -0,0 +1,188 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import asyncio
+import itertools
+import logging
+import math
+import os
+import pickle
+import time
+from typing import (Any, Callable, Coroutine, Dict, Generator, Iterable, List,
+                    Optional, Tuple)
+
+from .gatherer import AsyncGatherer
+from .parallelizer import Parallelizer, RaiseOnCall, Task
+from .pooler import BlockingProcessPooler, BlockingThreadPooler
+
+
+class AutoParallelizer(Parallelizer):
+    """
+    Runs the first `num_samples` items of each call sequentially while
+    measuring their wall and CPU time, whether they return coroutines, and how
+    large their arguments and results are when pickled, then hands the rest of
+    the stream to the parallelizer best suited to those measurements. The
+    choice and the measurements behind it are logged and kept in `decision`.
+    """
+    def __init__(
+        self, num_samples: Optional[int] = 8, max_workers: Optional[int] = None,
+        max_threads: Optional[int] = 32,
+        min_item_seconds: Optional[float] = 0.001,
+        cpu_bound_fraction: Optional[float] = 0.7,
+        task_overhead_seconds: Optional[float] = 0.0002, *args, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self.num_samples = num_samples
+        self.max_workers = max_workers
+        self.max_threads = max_threads
+        self.min_item_seconds = min_item_seconds
+        self.cpu_bound_fraction = cpu_bound_fraction
+        self.task_overhead_seconds = task_overhead_seconds
+        self.decision: Optional[Dict[str, Any]] = None
+
+
+    @staticmethod
+    def _pickle_cost(obj: Any) -> Tuple[Optional[int], float]:
+        start: float = time.perf_counter()
+        try:
+            payload: bytes = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.loads(payload)
+        except Exception:
+            return None, 0.0
+        return len(payload), time.perf_counter() - start
+
+
+    def _decide(
+        self, samples: List[Dict[str, Any]],
+        error_handling: Optional[bool] = False
+    ) -> Tuple[Parallelizer, Dict[str, Any]]:
+        num_cpus: int = os.cpu_count() or 1
+        wall: float = sum(s["wall"] for s in samples) / len(samples)
+        cpu: float = sum(s["cpu"] for s in samples) / len(samples)
+        cpu_fraction: float = min(cpu / wall, 1.0) if wall > 0 else 1.0
+        picklable: bool = all(s["payload_bytes"] is not None for s in samples)
+        payload_bytes: Optional[int] = None
+        ipc_seconds: Optional[float] = None
+        if picklable:
+            payload_bytes = sum(s["payload_bytes"] for s in samples) // len(samples)
+            ipc_seconds = self.task_overhead_seconds + 2 * sum(
+                s["pickle_seconds"] for s in samples
+            ) / len(samples)
+        decision: Dict[str, Any] = {
+            "num_samples": len(samples), "mean_wall_seconds": wall,
+            "mean_cpu_seconds": cpu, "cpu_fraction": cpu_fraction,
+            "coroutine": any(s["coroutine"] for s in samples),
+            "payload_bytes": payload_bytes, "ipc_seconds": ipc_seconds,
+            "max_workers": None
+        }
+
+        if decision["coroutine"]:
+            decision["reason"] = "items return coroutines"
+            return AsyncGatherer(), decision
+        if wall < self.min_item_seconds:
+            decision["reason"] = "items are too fast to benefit from a pool"
+            return Parallelizer(), decision
+        if cpu_fraction >= self.cpu_bound_fraction:
+            # CPU-bound items hold the GIL, so only processes can help.
+            if num_cpus <= 1:
+                decision["reason"] = "items are CPU-bound and only one CPU is available"
+                return Parallelizer(), decision
+            if not picklable:
+                decision["reason"] = "items are CPU-bound but cannot be pickled"
+                return Parallelizer(), decision
+            if error_handling:
+                # Process pools do not retry or record failed items.
+                decision["reason"] = "items are CPU-bound but need retries or failure recording"
+                return Parallelizer(), decision
+            if ipc_seconds >= wall / 2:
+                decision["reason"] = "items are CPU-bound but cheaper than their IPC"
+                return Parallelizer(), decision
+            max_workers: int = self.max_workers or num_cpus
+            decision["max_workers"] = max_workers
+            decision["reason"] = "items are CPU-bound and cheap to pickle"
+            return BlockingProcessPooler(
+                max_workers=max_workers, queue_size=2 * max_workers
+            ), decision
+        # Items mostly wait, so enough threads to keep every CPU busy.
+        max_workers = self.max_workers or min(
+            self.max_threads,
+            max(2, math.ceil(num_cpus / max(cpu_fraction, 1 / self.max_threads)))
+        )
+        decision["max_workers"] = max_workers
+        decision["reason"] = "items are I/O-bound"
+        return BlockingThreadPooler(
+            max_workers=max_workers, queue_size=2 * max_workers
+        ), decision
+
+
+    def __call__(
+        self, iterable: Iterable, tuple_to_args: Optional[bool] = True,
+        dict_to_kwargs: Optional[bool] = True, num_tries: Optional[int] = 1,
+        raise_after_retries: Optional[bool] = True,
+        failed_tasks: Optional[List[Tuple[Callable, Tuple, Dict]]] = None
+    ) -> Generator:
+        error_handler: Callable = self._make_error_handler_decorator(
+            num_tries=num_tries, raise_after_retries=raise_after_retries,
+            failed_tasks=failed_tasks
+        )
+        iterable = iter(iterable)
+        samples: List[Dict[str, Any]] = list()
+        loop: Optional[asyncio.AbstractEventLoop] = None
+        try:
+            for task in itertools.islice(iterable, self.num_samples):
+                task = Task.from_tuple(task)
+                f: Callable = task.spec.f
+                try:
+                    call_args, call_kwargs = task.spec.bind(
+                        task.item, tuple_to_args=tuple_to_args,
+                        dict_to_kwargs=dict_to_kwargs
+                    )
+                except TypeError as error: # Duplicate keyword arguments
+                    f = RaiseOnCall(error)
+                    call_args, call_kwargs = task.spec.args, task.item
+                wall_start: float = time.perf_counter()
+                cpu_start: float = time.thread_time()
+                result: Any = error_handler(f)(*call_args, **call_kwargs)
+                coroutine: bool = isinstance(result, Coroutine)
+                if coroutine:
+                    if loop is None:
+                        loop = asyncio.new_event_loop()
+                    result = loop.run_until_complete(result)
+                cpu: float = time.thread_time() - cpu_start
+                wall: float = time.perf_counter() - wall_start
+                args_bytes, args_seconds = self._pickle_cost(
+                    (f, call_args, call_kwargs)
+                )
+                result_bytes, result_seconds = self._pickle_cost(result)
+                payload_bytes: Optional[int] = None
+                if args_bytes is not None and result_bytes is not None:
+                    payload_bytes = args_bytes + result_bytes
+                samples.append({
+                    "wall": wall, "cpu": cpu, "coroutine": coroutine,
+                    "payload_bytes": payload_bytes,
+                    "pickle_seconds": args_seconds + result_seconds
+                })
+                yield result
+        finally:
+            if loop is not None:
+                loop.close()
+        if len(samples) < self.num_samples: # The stream is already exhausted
+            return
+
+        parallelizer, decision = self._decide(
+            samples, error_handling=num_tries != 1 or not raise_after_retries
+        )
+        decision["parallelizer"] = type(parallelizer).__name__
+        self.decision = decision
+        logging.info(
+            f"{type(self).__name__} chose {decision['parallelizer']} "
+            f"(max_workers={decision['max_workers']}) because {decision['reason']}: "
+            f"mean wall time {decision['mean_wall_seconds']:.6f}s, "
+            f"CPU fraction {decision['cpu_fraction']:.2f}, "
+            f"payload {decision['payload_bytes']} bytes."
+        )
+        yield from parallelizer(
+            iterable, tuple_to_args=tuple_to_args,
+            dict_to_kwargs=dict_to_kwargs, num_tries=num_tries,
+            raise_after_retries=raise_after_retries, failed_tasks=failed_tasks
+        )
@@ -0,0 +1,398 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import collections
+import itertools
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import (Any, Callable, Deque, Dict, Generator, Iterator, List,
+                    Optional, Set, Tuple)
+
+
+def _qualified_name(fn: Callable) -> str:
+    module: Optional[str] = getattr(fn, "__module__", None)
+    name: str = getattr(fn, "__qualname__", None) or type(fn).__name__
+    return name if module is None else f"{module}.{name}"
+
+
+class DeadLetter:
+    """
+    A call which failed on every attempt. Unpacks as the `(fn, args, kwargs)`
+    tuple which `failed_tasks` lists hold. `fn` is only kept by in-memory
+    stores; persistent stores keep its qualified name in `fn_name`.
+    """
+    __slots__ = (
+        "fn", "fn_name", "args", "kwargs", "error_type", "error_message",
+        "attempts", "timestamp"
+    )
+
+
+    def __init__(
+        self, fn: Optional[Callable], fn_name: str, args: Tuple,
+        kwargs: Dict[str, Any], error_type: Optional[str] = None,
+        error_message: Optional[str] = None, attempts: Optional[int] = None,
+        timestamp: Optional[float] = None
+    ):
+        self.fn = fn
+        self.fn_name = fn_name
+        self.args = args
+        self.kwargs = kwargs
+        self.error_type = error_type
+        self.error_message = error_message
+        self.attempts = attempts
+        self.timestamp = timestamp
+
+
+    @classmethod
+    def from_call(
+        cls, fn: Callable, args: Tuple, kwargs: Dict[str, Any],
+        error: Optional[BaseException] = None, attempts: Optional[int] = None
+    ) -> "DeadLetter":
+        return cls(
+            fn=fn, fn_name=_qualified_name(fn), args=tuple(args),
+            kwargs=dict(kwargs),
+            error_type=None if error is None else type(error).__name__,
+            error_message=None if error is None else str(error),
+            attempts=attempts, timestamp=time.time()
+        )
+
+
+    def __iter__(self) -> Iterator:
+        return iter((self.fn, self.args, self.kwargs))
+
+
+    def __repr__(self) -> str:
+        return (
+            f"DeadLetter(fn_name={self.fn_name!r}, args={self.args!r}, "
+            f"kwargs={self.kwargs!r}, error_type={self.error_type!r}, "
+            f"attempts={self.attempts!r})"
+        )
+
+
+class DeadLetterStore:
+    """
+    Records calls which failed on every attempt. A store may be passed as
+    `failed_tasks` to any transformer or parallelizer, and the recorded calls
+    can be re-run with `Transformer.replay`. Subclasses implement `_add`,
+    `__iter__`, `__len__`, `drain` and `acknowledge`.
+
+    Replay is at-least-once: `drain` yields letters without removing them, and
+    `acknowledge` removes them once every replayed call has returned. A replay
+    which is interrupted leaves its letters to be drained again.
+    """
+    def __init__(self):
+        self.dropped: int = 0
+        self._lock = threading.Lock()
+
+
+    def record(
+        self, fn: Callable, args: Tuple, kwargs: Dict[str, Any],
+        error: Optional[BaseException] = None, attempts: Optional[int] = None
+    ) -> None:
+        letter: DeadLetter = DeadLetter.from_call(
+            fn, args, kwargs, error=error, attempts=attempts
+        )
+        with self._lock:
+            self._add(letter)
+
+
+    def append(self, task: Tuple[Callable, Tuple, Dict]) -> None:
+        # Lets a store stand in for a `failed_tasks` list.
+        fn, args, kwargs = task
+        self.record(fn, args, kwargs)
+
+
+    def _add(self, letter: DeadLetter) -> None:
+        raise NotImplementedError
+
+
+    def __iter__(self) -> Iterator[DeadLetter]:
+        raise NotImplementedError
+
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+    def drain(self) -> Generator:
+        # Yields the letters present when draining starts. Calls which fail
+        # again while draining are recorded afresh.
+        raise NotImplementedError
+
+
+    def acknowledge(self) -> None:
+        # Removes the letters yielded by the last `drain`.
+        raise NotImplementedError
+
+
+    def close(self) -> None:
+        pass
+
+
+    def __enter__(self) -> "DeadLetterStore":
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class MemoryDeadLetterStore(DeadLetterStore):
+    """
+    Keeps at most `max_items` letters in memory, dropping the oldest (and
+    counting them in `dropped`) once full.
+    """
+    def __init__(self, max_items: Optional[int] = None):
+        super().__init__()
+        self.max_items = max_items
+        self.letters: Deque[DeadLetter] = collections.deque(maxlen=max_items)
+        self._drained: Set[int] = set()
+
+
+    def _add(self, letter: DeadLetter) -> None:
+        if self.max_items is not None and len(self.letters) >= self.max_items:
+            self.dropped += 1
+        self.letters.append(letter)
+
+
+    def __iter__(self) -> Iterator[DeadLetter]:
+        with self._lock:
+            return iter(list(self.letters))
+
+
+    def __len__(self) -> int:
+        return len(self.letters)
+
+
+    def drain(self) -> Generator:
+        with self._lock:
+            letters: List[DeadLetter] = list(self.letters)
+            self._drained = set(map(id, letters))
+        yield from letters
+
+
+    def acknowledge(self) -> None:
+        with self._lock:
+            self.letters = collections.deque(
+                (letter for letter in self.letters if id(letter) not in self._drained),
+                maxlen=self.max_items
+            )
+            self._drained = set()
+
+
+class FileDeadLetterStore(DeadLetterStore):
+    """
+    Appends each letter to the file at `path` as a pickle record, so letters
+    survive the process. Arguments must be picklable; letters whose
+    arguments are not are logged and counted in `dropped`.
+    """
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.file = None
+
+
+    @staticmethod
+    def _dumps(letter: DeadLetter) -> bytes:
+        # Functions are not stored since replay uses the transformer's own.
+        return pickle.dumps(
+            (None, *(getattr(letter, name) for name in DeadLetter.__slots__[1:])),
+            protocol=pickle.HIGHEST_PROTOCOL
+        )
+
+
+    @staticmethod
+    def _read(path: str) -> Generator:
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            while True:
+                try:
+                    fields: Tuple = pickle.load(f)
+                except EOFError:
+                    return
+                except pickle.UnpicklingError: # A write torn by a crash
+                    logging.warning(f"Ignoring a truncated record at the end of {path}.")
+                    return
+                yield DeadLetter(*fields)
+
+
+    def _add(self, letter: DeadLetter) -> None:
+        try:
+            record: bytes = self._dumps(letter)
+        except Exception as e:
+            logging.warning(
+                f"Dropping a dead letter for {letter.fn_name} which cannot be pickled: {type(e).__name__}: {str(e)}"
+            )
+            self.dropped += 1
+            return
+        if self.file is None:
+            self.file = open(self.path, "ab")
+        self.file.write(record)
+        self.file.flush()
+
+
+    def __iter__(self) -> Iterator[DeadLetter]:
+        with self._lock:
+            if self.file is not None:
+                self.file.flush()
+        # Letters drained but not yet acknowledged are still held.
+        return itertools.chain(
+            self._read(self.path + ".draining"), self._read(self.path)
+        )
+
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+    def drain(self) -> Generator:
+        draining: str = self.path + ".draining"
+        with self._lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            # A drain which was not acknowledged is finished before starting
+            # anew.
+            if not os.path.exists(draining) and os.path.exists(self.path):
+                os.replace(self.path, draining)
+        yield from self._read(draining)
+
+
+    def acknowledge(self) -> None:
+        try:
+            os.remove(self.path + ".draining")
+        except FileNotFoundError:
+            pass
+
+
+    def close(self) -> None:
+        with self._lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+class SQLiteDeadLetterStore(DeadLetterStore):
+    """
+    Appends each letter to a table in the SQLite database at `database`, so
+    letters survive the process and can be inspected with SQL. Arguments must
+    be picklable; letters whose arguments are not are logged and counted in
+    `dropped`.
+    """
+    def __init__(
+        self, database: str, table: Optional[str] = "dead_letters",
+        batch_size: Optional[int] = 1000
+    ):
+        super().__init__()
+        self.database = database
+        self.table = table
+        self.batch_size = batch_size
+        self._drained_up_to: Optional[int] = None
+        self.connection = sqlite3.connect(database, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, fn_name TEXT, "
+                "payload BLOB, error_type TEXT, error_message TEXT, "
+                "attempts INTEGER, timestamp REAL)"
+            )
+
+
+    def _add(self, letter: DeadLetter) -> None:
+        try:
+            payload: bytes = pickle.dumps(
+                (letter.args, letter.kwargs), protocol=pickle.HIGHEST_PROTOCOL
+            )
+        except Exception as e:
+            logging.warning(
+                f"Dropping a dead letter for {letter.fn_name} which cannot be pickled: {type(e).__name__}: {str(e)}"
+            )
+            self.dropped += 1
+            return
+        with self.connection:
+            self.connection.execute(
+                f"INSERT INTO {self.table} (fn_name, payload, error_type, "
+                "error_message, attempts, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    letter.fn_name, payload, letter.error_type,
+                    letter.error_message, letter.attempts, letter.timestamp
+                )
+            )
+
+
+    def _rows(self, after: int, up_to: Optional[int] = None) -> List[Tuple]:
+        if up_to is None:
+            up_to = 2 ** 63 - 1 # The largest SQLite rowid
+        with self._lock:
+            return self.connection.execute(
+                f"SELECT id, fn_name, payload, error_type, error_message, "
+                f"attempts, timestamp FROM {self.table} WHERE id > ? AND id <= ? "
+                "ORDER BY id LIMIT ?",
+                (after, up_to, self.batch_size)
+            ).fetchall()
+
+
+    @staticmethod
+    def _letter(row: Tuple) -> DeadLetter:
+        _, fn_name, payload, error_type, error_message, attempts, timestamp = row
+        args, kwargs = pickle.loads(payload)
+        return DeadLetter(
+            fn=None, fn_name=fn_name, args=args, kwargs=kwargs,
+            error_type=error_type, error_message=error_message,
+            attempts=attempts, timestamp=timestamp
+        )
+
+
+    def __iter__(self) -> Iterator[DeadLetter]:
+        after: int = 0
+        while True:
+            rows: List[Tuple] = self._rows(after)
+            if not rows:
+                return
+            yield from map(self._letter, rows)
+            after = rows[-1][0]
+
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.connection.execute(
+                f"SELECT COUNT(*) FROM {self.table}"
+            ).fetchone()[0]
+
+
+    def drain(self) -> Generator:
+        with self._lock:
+            last: Optional[int] = self.connection.execute(
+                f"SELECT MAX(id) FROM {self.table}"
+            ).fetchone()[0]
+        self._drained_up_to = last
+        if last is None:
+            return
+        after: int = 0
+        while True:
+            rows: List[Tuple] = self._rows(after, up_to=last)
+            if not rows:
+                return
+            yield from map(self._letter, rows)
+            after = rows[-1][0]
+
+
+    def acknowledge(self) -> None:
+        # Letters recorded while draining have larger ids and are kept.
+        if self._drained_up_to is None:
+            return
+        with self._lock, self.connection:
+            self.connection.execute(
+                f"DELETE FROM {self.table} WHERE id <= ?", (self._drained_up_to,)
+            )
+        self._drained_up_to = None
+
+
+    def close(self) -> None:
+        with self._lock:
+            self.connection.close()
@@ -0,0 +1,522 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import argparse
+import collections
+import concurrent.futures
+import hmac
+import ipaddress
+import itertools
+import logging
+import multiprocessing
+import os
+import pickle
+import queue
+import selectors
+import socket
+import struct
+import threading
+import time
+from typing import (Any, Callable, Deque, Dict, Generator, Iterable, List,
+                    Optional, Set, Tuple)
+
+from .parallelizer import Parallelizer
+
+
+_HEADER = struct.Struct("!I")
+_CHALLENGE_SIZE = 32
+_WELCOME = b"#WELCOME"
+_FAILURE = b"#FAILURE"
+
+
+def _send(sock: socket.socket, message: Any) -> None:
+    payload: bytes = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exactly(sock: socket.socket, num_bytes: int) -> bytes:
+    chunks: List[bytes] = list()
+    while num_bytes:
+        chunk: bytes = sock.recv(num_bytes)
+        if not chunk:
+            raise ConnectionError("The connection was closed.")
+        chunks.append(chunk)
+        num_bytes -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv(sock: socket.socket) -> Any:
+    size, = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    return pickle.loads(_recv_exactly(sock, size))
+
+
+def _digest(authkey: bytes, message: bytes) -> bytes:
+    return hmac.new(authkey, message, "sha256").digest()
+
+
+def _deliver_challenge(sock: socket.socket, authkey: bytes) -> None:
+    message: bytes = os.urandom(_CHALLENGE_SIZE)
+    sock.sendall(message)
+    response: bytes = _recv_exactly(sock, len(_digest(authkey, message)))
+    if not hmac.compare_digest(response, _digest(authkey, message)):
+        sock.sendall(_FAILURE)
+        raise multiprocessing.AuthenticationError("Digest received was wrong.")
+    sock.sendall(_WELCOME)
+
+
+def _answer_challenge(sock: socket.socket, authkey: bytes) -> None:
+    message: bytes = _recv_exactly(sock, _CHALLENGE_SIZE)
+    sock.sendall(_digest(authkey, message))
+    if _recv_exactly(sock, len(_WELCOME)) != _WELCOME:
+        raise multiprocessing.AuthenticationError("Digest was rejected.")
+
+
+def _load_outcome(ok: bool, payload: bytes) -> Tuple[bool, Any]:
+    # Each result is pickled on its own, so one which cannot be unpickled
+    # here (e.g. an exception with required arguments) fails only its item.
+    try:
+        return ok, pickle.loads(payload)
+    except Exception as e:
+        return False, RuntimeError(
+            f"The result could not be unpickled: {type(e).__name__}: {str(e)}"
+        )
+
+
+def _is_loopback(host: str) -> bool:
+    try:
+        return all(
+            ipaddress.ip_address(info[4][0]).is_loopback
+            for info in socket.getaddrinfo(host, None)
+        )
+    except (OSError, ValueError):
+        return False
+
+
+def _run_task(
+    f: Callable, args: Tuple, kwargs: Dict, num_tries: int
+) -> Tuple[bool, Any]:
+    error: Optional[Exception] = None
+    for _ in range(num_tries):
+        try:
+            return True, f(*args, **kwargs)
+        except Exception as e:
+            error = e
+    return False, error
+
+
+class _WorkerConnection:
+    def __init__(self, sock: socket.socket, address: Tuple):
+        self.sock = sock
+        self.address = address
+        self.buffer = bytearray()
+        self.credits = 0
+        self.assigned: Set[int] = set()
+        self.last_seen = time.monotonic()
+
+
+    def read_messages(self) -> List[Any]:
+        chunk: bytes = self.sock.recv(1 << 16)
+        if not chunk:
+            raise ConnectionError("The connection was closed.")
+        self.buffer.extend(chunk)
+        self.last_seen = time.monotonic()
+        messages: List[Any] = list()
+        while len(self.buffer) >= _HEADER.size:
+            size, = _HEADER.unpack_from(self.buffer)
+            if len(self.buffer) < _HEADER.size + size:
+                break
+            try:
+                messages.append(
+                    pickle.loads(self.buffer[_HEADER.size:_HEADER.size + size])
+                )
+            except Exception as e:
+                raise ConnectionError(
+                    f"A malformed message was received: {type(e).__name__}: {str(e)}"
+                )
+            del self.buffer[:_HEADER.size + size]
+        return messages
+
+
+class DistributedParallelizer(Parallelizer):
+    """
+    Distributes items to worker processes which connect to a coordinator over
+    TCP. Workers are started with `run_worker()` (or
+    `python -m light_pipe.distributed HOST PORT`) on any machine which can
+    import the transformed functions, and `local_workers` are started on this
+    machine. Workers pull batches of at most `batch_size` items and never hold
+    more than their `credits`. Workers which disconnect or send no heartbeat
+    for `heartbeat_timeout` seconds are dropped and their items re-dispatched.
+
+    Since messages are pickled, the coordinator and each worker prove that
+    they share `authkey` with an HMAC challenge in both directions before
+    either unpickles anything. `authkey` defaults to this process's
+    `multiprocessing` authkey, which local workers inherit, and must be set
+    to bind a host other than loopback.
+    """
+    def __init__(
+        self, host: Optional[str] = "127.0.0.1", port: Optional[int] = 0,
+        local_workers: Optional[int] = 0, credits: Optional[int] = 4,
+        batch_size: Optional[int] = 16, queue_size: Optional[int] = None,
+        heartbeat_interval: Optional[float] = 1.0,
+        heartbeat_timeout: Optional[float] = 10.0,
+        worker_timeout: Optional[float] = 60.0,
+        mp_context: Optional[multiprocessing.context.BaseContext] = None,
+        authkey: Optional[bytes] = None,
+        handshake_timeout: Optional[float] = 10.0, *args, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        if authkey is None:
+            if not _is_loopback(host):
+                raise ValueError(
+                    f"An `authkey` must be passed to bind the non-loopback host {host!r}."
+                )
+            authkey = multiprocessing.current_process().authkey
+        if queue_size is None:
+            queue_size = 4 * batch_size * max(local_workers, 1)
+        self.host = host
+        self.port = port
+        self.local_workers = local_workers
+        self.credits = credits
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.worker_timeout = worker_timeout
+        self.mp_context = mp_context
+        self.authkey = bytes(authkey)
+        self.handshake_timeout = handshake_timeout
+        self.address: Optional[Tuple[str, int]] = None
+
+
+    def _start_local_workers(self) -> List[multiprocessing.Process]:
+        ctx = self.mp_context
+        if ctx is None:
+            ctx = multiprocessing.get_context()
+        processes: List[multiprocessing.Process] = [
+            ctx.Process(
+                target=run_worker,
+                kwargs={
+                    "host": self.address[0], "port": self.address[1],
+                    "credits": self.credits,
+                    "heartbeat_interval": self.heartbeat_interval,
+                    "authkey": self.authkey
+                },
+                daemon=True
+            ) for _ in range(self.local_workers)
+        ]
+        for process in processes:
+            process.start()
+        return processes
+
+
+    def __call__(
+        self, iterable: Iterable, tuple_to_args: Optional[bool] = True,
+        dict_to_kwargs: Optional[bool] = True, num_tries: Optional[int] = 1,
+        raise_after_retries: Optional[bool] = True,
+        failed_tasks: Optional[List[Tuple[Callable, Tuple, Dict]]] = None
+    ) -> Generator:
+        if not raise_after_retries:
+            assert failed_tasks is not None, \
+                "`failed_tasks` must be passed when `raise_after_retries` is `False`."
+        listener = socket.create_server((self.host, self.port))
+        listener.setblocking(False)
+        self.address = listener.getsockname()[:2]
+        selector = selectors.DefaultSelector()
+        selector.register(listener, selectors.EVENT_READ)
+        # Handshakes run on helper threads so that a client which connects
+        # and stays silent cannot stall dispatch. Authenticated sockets are
+        # handed back through `accepted`, and `wake_w` wakes the selector.
+        wake_r, wake_w = socket.socketpair()
+        wake_r.setblocking(False)
+        selector.register(wake_r, selectors.EVENT_READ)
+        accepted: queue.Queue = queue.Queue()
+        closing = threading.Event()
+        processes: List[multiprocessing.Process] = self._start_local_workers()
+        workers: Dict[socket.socket, _WorkerConnection] = dict()
+
+
+        def handshake(sock: socket.socket, address: Tuple) -> None:
+            try:
+                sock.settimeout(self.handshake_timeout)
+                _deliver_challenge(sock, self.authkey)
+                _answer_challenge(sock, self.authkey)
+                sock.setblocking(True)
+            except (OSError, multiprocessing.AuthenticationError) as e:
+                logging.warning(
+                    f"Rejecting a connection from {address}: {type(e).__name__}: {str(e)}"
+                )
+                sock.close()
+                return
+            if closing.is_set():
+                sock.close()
+                return
+            accepted.put((sock, address))
+            try:
+                wake_w.send(b"\0")
+            except OSError:
+                pass
+
+        iterable = self._bind_tasks(
+            iterable, tuple_to_args=tuple_to_args,
+            dict_to_kwargs=dict_to_kwargs
+        )
+        task_ids = itertools.count()
+        pending: Dict[int, Tuple[Callable, Tuple, Dict]] = dict()
+        queued: Deque[int] = collections.deque()
+        exhausted = False
+        idle_since: float = time.monotonic()
+
+
+        def drop_worker(worker: _WorkerConnection, reason: str) -> None:
+            logging.warning(
+                f"Dropping worker {worker.address}: {reason}. Re-dispatching {len(worker.assigned)} items."
+            )
+            selector.unregister(worker.sock)
+            worker.sock.close()
+            del workers[worker.sock]
+            queued.extendleft(
+                task_id for task_id in worker.assigned if task_id in pending
+            )
+
+
+        try:
+            while True:
+                demand: int = sum(worker.credits for worker in workers.values())
+                while not exhausted and len(queued) < demand and \
+                    len(pending) < self.queue_size:
+                    try:
+                        f, call_args, call_kwargs = next(iterable)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    task_id = next(task_ids)
+                    pending[task_id] = (f, call_args, call_kwargs)
+                    queued.append(task_id)
+                if exhausted and not pending:
+                    break
+
+                for worker in list(workers.values()):
+                    if not queued:
+                        break
+                    num_tasks: int = min(worker.credits, self.batch_size, len(queued))
+                    if not num_tasks:
+                        continue
+                    batch: List[int] = [queued.popleft() for _ in range(num_tasks)]
+                    try:
+                        _send(
+                            worker.sock, (
+                                "tasks", num_tries,
+                                [(task_id, *pending[task_id]) for task_id in batch]
+                            )
+                        )
+                    except OSError as e:
+                        queued.extendleft(reversed(batch))
+                        drop_worker(worker, reason=str(e))
+                        continue
+                    worker.credits -= num_tasks
+                    worker.assigned.update(batch)
+
+                outcomes: List[Tuple[int, bool, Any]] = list()
+                for key, _ in selector.select(timeout=self.heartbeat_interval):
+                    if key.fileobj is listener:
+                        sock, address = listener.accept()
+                        threading.Thread(
+                            target=handshake, args=(sock, address), daemon=True
+                        ).start()
+                        continue
+                    if key.fileobj is wake_r:
+                        try:
+                            wake_r.recv(1 << 10)
+                        except BlockingIOError:
+                            pass
+                        while not accepted.empty():
+                            sock, address = accepted.get()
+                            workers[sock] = _WorkerConnection(
+                                sock=sock, address=address
+                            )
+                            selector.register(sock, selectors.EVENT_READ)
+                        continue
+                    worker = workers[key.fileobj]
+                    try:
+                        messages: List[Any] = worker.read_messages()
+                    except (OSError, ConnectionError) as e:
+                        drop_worker(worker, reason=str(e))
+                        continue
+                    for message in messages:
+                        if message[0] == "request":
+                            worker.credits += message[1]
+                        elif message[0] == "results":
+                            for task_id, ok, payload in message[1]:
+                                worker.assigned.discard(task_id)
+                                worker.credits += 1
+                                if task_id in pending:
+                                    outcomes.append(
+                                        (task_id, *_load_outcome(ok, payload))
+                                    )
+
+                now: float = time.monotonic()
+                for worker in list(workers.values()):
+                    if now - worker.last_seen > self.heartbeat_timeout:
+                        drop_worker(worker, reason="heartbeat timed out")
+                if workers:
+                    idle_since = now
+                elif now - idle_since > self.worker_timeout:
+                    raise RuntimeError(
+                        f"No workers connected to {self.address} within {self.worker_timeout} seconds."
+                    )
+
+                for task_id, ok, value in outcomes:
+                    f, call_args, call_kwargs = pending.pop(task_id)
+                    if ok:
+                        yield value
+                    elif raise_after_retries:
+                        raise value
+                    else:
+                        logging.warning(
+                            f"An exception occurred while processing an item: {type(value).__name__}: {str(value)}"
+                        )
+                        self._record_failure(
+                            failed_tasks, f, call_args, call_kwargs,
+                            error=value, attempts=num_tries
+                        )
+                        yield None
+        finally:
+            for worker in list(workers.values()):
+                try:
+                    _send(worker.sock, ("stop",))
+                except OSError:
+                    pass
+                worker.sock.close()
+            closing.set()
+            while not accepted.empty():
+                accepted.get()[0].close()
+            selector.close()
+            listener.close()
+            wake_r.close()
+            wake_w.close()
+            for process in processes:
+                process.join(timeout=self.heartbeat_timeout)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+
+
+def run_worker(
+    host: str, port: int, credits: Optional[int] = 4,
+    num_threads: Optional[int] = 1, heartbeat_interval: Optional[float] = 1.0,
+    connect_timeout: Optional[float] = 30.0, authkey: Optional[bytes] = None
+) -> None:
+    if authkey is None:
+        authkey = multiprocessing.current_process().authkey
+    deadline: float = time.monotonic() + connect_timeout
+    while True:
+        try:
+            sock = socket.create_connection((host, port))
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+    try:
+        _answer_challenge(sock, authkey)
+        _deliver_challenge(sock, authkey)
+    except BaseException:
+        sock.close()
+        raise
+
+    send_lock = threading.Lock()
+    results: List[Tuple[int, bool, Any]] = list()
+    results_ready = threading.Condition()
+    stopped = threading.Event()
+
+
+    def send(message: Any) -> None:
+        with send_lock:
+            _send(sock, message)
+
+
+    def run(task_id: int, f: Callable, args: Tuple, kwargs: Dict, num_tries: int):
+        ok, value = _run_task(f, args, kwargs, num_tries)
+        try:
+            payload: bytes = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            ok, payload = False, pickle.dumps(
+                RuntimeError(f"{type(e).__name__}: {str(e)}"),
+                protocol=pickle.HIGHEST_PROTOCOL
+            )
+        with results_ready:
+            results.append((task_id, ok, payload))
+            results_ready.notify()
+
+
+    def report() -> None:
+        # Sends finished results in batches; an empty batch is a heartbeat.
+        while not stopped.is_set():
+            with results_ready:
+                if not results:
+                    results_ready.wait(timeout=heartbeat_interval)
+                batch = results[:]
+                results.clear()
+            try:
+                send(("results", batch))
+            except OSError:
+                return
+
+
+    reporter = threading.Thread(target=report, daemon=True)
+    reporter.start()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
+        try:
+            send(("request", credits))
+            while True:
+                message: Any = _recv(sock)
+                if message[0] == "stop":
+                    break
+                _, num_tries, batch = message
+                for task_id, f, args, kwargs in batch:
+                    executor.submit(run, task_id, f, args, kwargs, num_tries)
+        except (OSError, ConnectionError):
+            pass
+        finally:
+            stopped.set()
+            with results_ready:
+                results_ready.notify()
+    reporter.join()
+    sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a Light-Pipe worker for a `DistributedParallelizer`."
+    )
+    parser.add_argument("host")
+    parser.add_argument("port", type=int)
+    parser.add_argument("--credits", type=int, default=4)
+    parser.add_argument("--num-threads", type=int, default=1)
+    parser.add_argument("--heartbeat-interval", type=float, default=1.0)
+    parser.add_argument("--connect-timeout", type=float, default=30.0)
+    parser.add_argument(
+        "--forever", action="store_true",
+        help="Reconnect after each pipeline finishes."
+    )
+    parser.add_argument(
+        "--authkey", default=os.environ.get("LIGHT_PIPE_AUTHKEY"),
+        help="The coordinator's `authkey`. Defaults to $LIGHT_PIPE_AUTHKEY."
+    )
+    args = parser.parse_args()
+    if args.authkey is None:
+        parser.error("--authkey or $LIGHT_PIPE_AUTHKEY must be set.")
+    while True:
+        run_worker(
+            host=args.host, port=args.port, credits=args.credits,
+            num_threads=args.num_threads,
+            heartbeat_interval=args.heartbeat_interval,
+            connect_timeout=args.connect_timeout,
+            authkey=args.authkey.encode()
+        )
+        if not args.forever:
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import functools
+import hashlib
+import math
+import os
+import pickle
+import sqlite3
+import tempfile
+from typing import Any, Callable, Generator, Iterable, Optional, Set
+
+from .metrics import Metrics
+from .transformer import StreamTransformer
+
+
+def _digest(key: Any) -> bytes:
+    # Keys are compared by their pickled bytes, so keys which compare equal but
+    # pickle differently (`1` and `1.0`, or sets built in different orders)
+    # are treated as distinct. Pass `bytes` or `str` keys to avoid surprises.
+    if not isinstance(key, bytes):
+        key = pickle.dumps(key, protocol=4)
+    return hashlib.blake2b(key, digest_size=16).digest()
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: Optional[float] = 0.001):
+        assert 0 < error_rate < 1, "`error_rate` must be between 0 and 1."
+        num_bits: int = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = num_bits
+        self.num_hashes: int = max(1, round(num_bits / capacity * math.log(2)))
+        self.bits = bytearray((num_bits + 7) // 8)
+
+
+    def _indices(self, key: Any) -> Generator:
+        digest: bytes = _digest(key)
+        h1: int = int.from_bytes(digest[:8], "little")
+        h2: int = int.from_bytes(digest[8:16], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+
+    def add(self, key: Any) -> bool:
+        added = False
+        for index in self._indices(key):
+            byte, bit = divmod(index, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        return added
+
+
+    def __contains__(self, key: Any) -> bool:
+        return all(
+            self.bits[index // 8] & (1 << (index % 8))
+            for index in self._indices(key)
+        )
+
+
+class ExactIndex:
+    """
+    A set of key digests which holds at most `max_keys` digests in memory and
+    spills the rest to an SQLite table in a file of its own in `spill_dir`
+    (the system temporary directory by default), deleted by `close()`.
+    """
+    def __init__(
+        self, max_keys: Optional[int] = None, spill_dir: Optional[str] = None
+    ):
+        self.max_keys = max_keys
+        self.spill_dir = spill_dir
+        self.keys: Set[bytes] = set()
+        self.connection: Optional[sqlite3.Connection] = None
+        self._spill_path: Optional[str] = None
+
+
+    def _spill(self) -> None:
+        if self.connection is None:
+            fd, self._spill_path = tempfile.mkstemp(
+                prefix="dedup-", suffix=".db", dir=self.spill_dir
+            )
+            os.close(fd)
+            self.connection = sqlite3.connect(self._spill_path)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS keys (k BLOB PRIMARY KEY) WITHOUT ROWID"
+            )
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO keys VALUES (?)",
+                ((k,) for k in self.keys)
+            )
+        self.keys.clear()
+
+
+    def add(self, key: Any) -> bool:
+        digest: bytes = _digest(key)
+        if digest in self.keys:
+            return False
+        if self.connection is not None and self.connection.execute(
+            "SELECT 1 FROM keys WHERE k = ?", (digest,)
+        ).fetchone() is not None:
+            return False
+        self.keys.add(digest)
+        if self.max_keys is not None and len(self.keys) >= self.max_keys:
+            self._spill()
+        return True
+
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        if self._spill_path is not None:
+            try:
+                os.remove(self._spill_path)
+            except FileNotFoundError:
+                pass
+            self._spill_path = None
+        self.keys.clear()
+
+
+class Filter(StreamTransformer):
+    __name__: str = "Filter"
+
+
+    def __init__(
+        self, predicate: Optional[Callable] = None,
+        metrics: Optional[Metrics] = None, *args, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        if predicate is not None:
+            self.predicate = predicate
+        if metrics is None:
+            metrics = Metrics()
+        self.metrics = metrics
+
+
+    def predicate(self, item: Any) -> bool:
+        raise NotImplementedError(
+            (
+                f"Either pass a `Callable` instance to __init__() or overwrite this "
+                f"method in a subclass of {Filter.__name__}."
+            )
+        )
+
+
+    def _filter(self, iterable: Iterable, predicate: Callable) -> Generator:
+        dropped: int = 0
+        try:
+            for item in iterable:
+                if predicate(item):
+                    yield item
+                else:
+                    dropped += 1
+        finally:
+            self.metrics.increment("items_dropped", dropped)
+
+
+    def transform_stream(self, iterable: Iterable) -> Generator:
+        yield from self._filter(iterable, predicate=self.predicate)
+
+
+class Dedup(Filter):
+    """
+    Drops items whose `key(item)` has already been seen in the stream. Exact
+    deduplication keeps a 16-byte digest per key, spilling to disk past
+    `max_keys` digests; with `approximate=True` a Bloom filter sized for
+    `capacity` keys is used instead, which may drop unique items at roughly
+    `error_rate`. Keys are compared by their pickled bytes, so they should
+    be `bytes`, `str` or other values which pickle the same way whenever
+    they compare equal.
+    """
+    __name__: str = "Dedup"
+
+
+    def __init__(
+        self, key: Optional[Callable] = None,
+        approximate: Optional[bool] = False,
+        capacity: Optional[int] = 1_000_000,
+        error_rate: Optional[float] = 0.001, max_keys: Optional[int] = None,
+        spill_dir: Optional[str] = None, *args, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self.key = key
+        self.approximate = approximate
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.max_keys = max_keys
+        self.spill_dir = spill_dir
+
+
+    def transform_stream(self, iterable: Iterable) -> Generator:
+        key: Optional[Callable] = self.key
+        if self.approximate:
+            index: Any = BloomFilter(
+                capacity=self.capacity, error_rate=self.error_rate
+            )
+        else:
+            index = ExactIndex(max_keys=self.max_keys, spill_dir=self.spill_dir)
+        predicate: Callable = lambda item: index.add(
+            item if key is None else key(item)
+        )
+        try:
+            yield from self._filter(iterable, predicate=predicate)
+        finally:
+            if not self.approximate:
+                index.close()
+
+
+def make_filter(
+    predicate: Callable
+) -> Callable:
+    @functools.wraps(predicate)
+    def filter_wrapper(*args, **kwargs) -> Filter:
+        return Filter(predicate=predicate, *args, **kwargs)
+    return filter_wrapper
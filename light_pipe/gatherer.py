@@ -0,0 +1,259 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import asyncio
+import collections
+import functools
+import logging
+import queue
+import threading
+from typing import (Any, AsyncGenerator, Callable, Coroutine, Deque, Dict,
+                    Generator, Iterable, List, Optional, Set, Tuple, Union)
+
+from .memory import MemoryBudget
+from .parallelizer import Parallelizer
+from .resources import release_resources
+
+
+class QueueEmptySignal:
+    pass
+
+
+class AsyncGatherer(Parallelizer):
+    def __init__(
+        self, loop: Optional[asyncio.AbstractEventLoop] = None,
+        memory_budget: Optional[MemoryBudget] = None,
+        stage: Optional[str] = None, *args, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self.loop = loop
+        self.memory_budget = memory_budget
+        self.stage = stage or type(self).__name__
+        self._terminate_flag = False
+
+
+    def _make_async_error_handler_decorator(
+        self, num_tries: Optional[int] = 1, 
+        raise_after_retries: Optional[bool] = True,
+        failed_tasks: Optional[List[Tuple[Callable, Tuple, Dict]]] = None
+    ) -> Callable:
+        if not raise_after_retries:
+            assert failed_tasks is not None, \
+                "`failed_tasks` must be passed when `raise_after_retries` is `False`."
+        def handle_errors(fn: Callable) -> Callable:
+            @functools.wraps(fn)
+            async def handle_errors_wrapper(*args, **kwargs) -> Any:
+                error: Union[None, Exception] = None
+                for _ in range(num_tries):
+                    try:
+                        result: Any = fn(*args, **kwargs)
+                        if isinstance(result, Coroutine):
+                            return await result
+                        return result
+                    except Exception as e:
+                        error = e
+                        pass
+                if raise_after_retries:
+                    raise error
+                else:
+                    logging.warn(
+                        f"An exception occurred while processing an item: {type(error).__name__}: {str(error)}"
+                    )
+                    self._record_failure(
+                        failed_tasks, fn, args, kwargs, error=error,
+                        attempts=num_tries
+                    )
+            return handle_errors_wrapper
+        return handle_errors
+
+
+    def _make_async_decorator(self, f: Callable):
+        @functools.wraps(f)
+        async def async_wrapper(*args, **kwargs):
+            result = f(*args, **kwargs)
+            if isinstance(result, Coroutine):
+                return await result
+            return result
+        return async_wrapper
+
+
+    def _get_calls(
+        self, iterable: Iterable, tuple_to_args: Optional[bool] = True, 
+        dict_to_kwargs: Optional[bool] = True, num_tries: Optional[int] = 1, 
+        raise_after_retries: Optional[bool] = True, 
+        failed_tasks: Optional[List[Tuple[Callable, Tuple, Dict]]] = None
+    ) -> Generator:
+        error_handler: Callable = self._make_async_error_handler_decorator(
+            num_tries=num_tries, raise_after_retries=raise_after_retries,
+            failed_tasks=failed_tasks
+        )
+        decorator: Callable = lambda f: error_handler(
+            self._make_async_decorator(f)
+        )
+        return self._bind_tasks(
+            iterable, tuple_to_args=tuple_to_args,
+            dict_to_kwargs=dict_to_kwargs, decorator=decorator
+        )
+
+
+    def _get_tasks(self, iterable: Iterable, **kwargs) -> List[Coroutine]:
+        return [
+            f(*args, **call_kwargs)
+            for f, args, call_kwargs in self._get_calls(iterable, **kwargs)
+        ]
+            
+
+    async def _async_gen(
+        self, iterable: Iterable, account: Optional[Any] = None, **kwargs
+    ) -> AsyncGenerator:
+        if account is not None:
+            async for result in self._budgeted_gen(iterable, account, **kwargs):
+                yield result
+            return
+        tasks = self._get_tasks(iterable, **kwargs)
+        for result in asyncio.as_completed(tasks):
+            result = await result
+            yield result
+
+
+    async def _budgeted_gen(
+        self, iterable: Iterable, account: Any, **kwargs
+    ) -> AsyncGenerator:
+        # Yields `(num_bytes, result)` pairs. Each coroutine is only created
+        # once its item's bytes are held, and each result's bytes are held
+        # until it is consumed, so a full budget stops the stage reading
+        # further upstream. The loop keeps running whenever the stage waits
+        # for room, so that tasks holding bytes can finish.
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        size_fn: Callable = self.memory_budget.size_fn
+        running: Set[asyncio.Task] = set()
+        finished: Deque[asyncio.Task] = collections.deque()
+
+
+        def on_done(task: asyncio.Task, num_bytes: int) -> None:
+            account.release(num_bytes)
+            running.discard(task)
+            finished.append(task)
+
+
+        async def hold(num_bytes: int) -> None:
+            while not account.acquire(num_bytes, timeout=0):
+                if not running: # Only results awaiting consumption hold bytes
+                    await loop.run_in_executor(None, account.acquire, num_bytes)
+                    return
+                await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+
+
+        async def take_finished() -> AsyncGenerator:
+            while finished:
+                result: Any = finished.popleft().result()
+                num_bytes: int = size_fn(result)
+                await hold(num_bytes)
+                yield num_bytes, result
+
+
+        for f, args, call_kwargs in self._get_calls(iterable, **kwargs):
+            num_bytes: int = self.memory_budget.measure(args, call_kwargs)
+            while not account.acquire(num_bytes, timeout=0):
+                if finished: # Results are charged before further items
+                    async for pair in take_finished():
+                        yield pair
+                elif not running:
+                    await loop.run_in_executor(None, account.acquire, num_bytes)
+                    break
+                else:
+                    await asyncio.wait(
+                        running, return_when=asyncio.FIRST_COMPLETED
+                    )
+            task: asyncio.Task = loop.create_task(f(*args, **call_kwargs))
+            task.add_done_callback(functools.partial(on_done, num_bytes=num_bytes))
+            running.add(task)
+            await asyncio.sleep(0) # Lets started tasks run between items
+            async for pair in take_finished():
+                yield pair
+        while running or finished:
+            if not finished:
+                await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            async for pair in take_finished():
+                yield pair
+
+
+    def _iter(
+        self, loop: asyncio.AbstractEventLoop, async_generator: AsyncGenerator, 
+        q: queue.Queue, account: Optional[Any] = None
+    ) -> Generator:
+        ait = async_generator.__aiter__()
+        async def get_next() -> Tuple[bool, Any]:
+            try:
+                obj = await ait.__anext__()
+                done = False
+            except StopAsyncIteration:
+                obj = None
+                done = True
+            return done, obj
+
+
+        while not self._terminate_flag:
+            done, obj = loop.run_until_complete(get_next())
+            if done:
+                # Resources opened on this loop are closed while it can still
+                # await their teardowns.
+                release_resources(thread=threading.current_thread())
+                q.put(QueueEmptySignal())
+                break
+            # yield obj 
+            q.put(obj) # With a budget, a `(num_bytes, result)` pair
+
+
+    def _queue_generator(
+        self, q: queue.Queue, account: Optional[Any] = None
+    ) -> Generator:
+        while not self._terminate_flag:
+            obj: Any = q.get()
+            if isinstance(obj, QueueEmptySignal):
+                break
+            if account is not None:
+                num_bytes, obj = obj
+                account.release(num_bytes)
+            yield obj   
+
+
+    def __call__(
+        self, iterable: Iterable,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+        tuple_to_args: Optional[bool] = True, 
+        dict_to_kwargs: Optional[bool] = True, num_tries: Optional[int] = 1, 
+        raise_after_retries: Optional[bool] = True, 
+        failed_tasks: Optional[List[Tuple[Callable, Tuple, Dict]]] = None
+    ) -> Generator:
+        if loop is None:
+            if self.loop is not None:
+                loop = self.loop
+            else:
+                loop = asyncio.new_event_loop()
+        q: queue.Queue = queue.Queue()
+        account: Optional[Any] = None
+        if self.memory_budget is not None:
+            account = self.memory_budget.account(self.stage)
+        async_generator = self._async_gen(
+            iterable, account=account, tuple_to_args=tuple_to_args,
+            dict_to_kwargs=dict_to_kwargs, num_tries=num_tries,
+            raise_after_retries=raise_after_retries, failed_tasks=failed_tasks
+        )
+        t = threading.Thread(
+            target=self._iter, 
+            kwargs={
+                "loop": loop,
+                "async_generator": async_generator,
+                "q": q,
+                "account": account
+            }
+        )
+        t.start()
+        try:
+            yield from self._queue_generator(q=q, account=account)
+        finally:
+            if account is not None:
+                account.close()
+        t.join()
+        release_resources(dead_threads_only=True)
@@ -0,0 +1,234 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import asyncio
+import concurrent.futures
+import itertools
+import logging
+import multiprocessing
+import pickle
+import queue
+from typing import (Any, Callable, Coroutine, Dict, Generator, Iterable, List,
+                    Optional, Tuple)
+
+from .parallelizer import Parallelizer
+
+
+def _dumps_outcome(ok: bool, value: Any) -> Tuple[bool, bytes]:
+    try:
+        return ok, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        if ok:
+            error = e
+        else:
+            error = RuntimeError(f"{type(value).__name__}: {str(value)}")
+        return False, pickle.dumps(error, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+async def _run_task(
+    loop: asyncio.AbstractEventLoop, f: Callable, args: Tuple, kwargs: Dict,
+    num_tries: int
+) -> Tuple[bool, bytes]:
+    error: Optional[Exception] = None
+    for _ in range(num_tries):
+        try:
+            if asyncio.iscoroutinefunction(f):
+                result: Any = await f(*args, **kwargs)
+            else:
+                result = await loop.run_in_executor(
+                    None, lambda: f(*args, **kwargs)
+                )
+                if isinstance(result, Coroutine):
+                    result = await result
+            return _dumps_outcome(True, result)
+        except Exception as e:
+            error = e
+    return _dumps_outcome(False, error)
+
+
+async def _worker_loop(
+    task_q: multiprocessing.Queue, result_q: multiprocessing.Queue,
+    concurrency: int, num_threads: int, num_tries: int
+) -> None:
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(
+        concurrent.futures.ThreadPoolExecutor(max_workers=num_threads)
+    )
+    reader = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    semaphore = asyncio.Semaphore(concurrency)
+    running: set = set()
+
+
+    async def run_and_report(task_id: int, task: bytes):
+        try:
+            try:
+                f, args, kwargs = pickle.loads(task)
+            except Exception as e: # E.g. the function's module is missing
+                ok, payload = _dumps_outcome(False, e)
+            else:
+                ok, payload = await _run_task(loop, f, args, kwargs, num_tries)
+            result_q.put((task_id, ok, payload))
+        finally:
+            semaphore.release()
+
+
+    while True:
+        await semaphore.acquire()
+        message = await loop.run_in_executor(reader, task_q.get)
+        if message is None:
+            break
+        task = loop.create_task(run_and_report(*message))
+        running.add(task)
+        task.add_done_callback(running.discard)
+    if running:
+        await asyncio.gather(*running)
+    reader.shutdown(wait=False)
+
+
+def _worker_main(
+    task_q: multiprocessing.Queue, result_q: multiprocessing.Queue,
+    concurrency: int, num_threads: int, num_tries: int
+) -> None:
+    asyncio.run(
+        _worker_loop(
+            task_q=task_q, result_q=result_q, concurrency=concurrency,
+            num_threads=num_threads, num_tries=num_tries
+        )
+    )
+
+
+class AsyncProcessPooler(Parallelizer):
+    """
+    Runs `max_workers` processes, each with its own event loop multiplexing up
+    to `concurrency` items at a time. Coroutine functions run on the worker's
+    loop; other functions run on a thread pool of `num_threads` threads in the
+    worker, and any coroutines they return are awaited on the loop. At most
+    `queue_size` items are in flight across all workers.
+    """
+    def __init__(
+        self, max_workers: int, concurrency: Optional[int] = 64,
+        num_threads: Optional[int] = None, queue_size: Optional[int] = None,
+        mp_context: Optional[multiprocessing.context.BaseContext] = None,
+        poll_interval: Optional[float] = 0.1, *args, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        if num_threads is None:
+            num_threads = concurrency
+        if queue_size is None:
+            queue_size = 2 * max_workers * concurrency
+        self.max_workers = max_workers
+        self.concurrency = concurrency
+        self.num_threads = num_threads
+        self.queue_size = queue_size
+        self.mp_context = mp_context
+        self.poll_interval = poll_interval
+
+
+    def _get_result(
+        self, result_q: multiprocessing.Queue,
+        processes: List[multiprocessing.Process]
+    ) -> Tuple[int, bool, bytes]:
+        while True:
+            try:
+                return result_q.get(timeout=self.poll_interval)
+            except queue.Empty:
+                for process in processes:
+                    if not process.is_alive() and process.exitcode != 0:
+                        raise RuntimeError(
+                            f"A worker process exited unexpectedly with exit code {process.exitcode}."
+                        )
+
+
+    def __call__(
+        self, iterable: Iterable, tuple_to_args: Optional[bool] = True,
+        dict_to_kwargs: Optional[bool] = True, num_tries: Optional[int] = 1,
+        raise_after_retries: Optional[bool] = True,
+        failed_tasks: Optional[List[Tuple[Callable, Tuple, Dict]]] = None
+    ) -> Generator:
+        if not raise_after_retries:
+            assert failed_tasks is not None, \
+                "`failed_tasks` must be passed when `raise_after_retries` is `False`."
+        ctx = self.mp_context
+        if ctx is None:
+            ctx = multiprocessing.get_context()
+        task_q = ctx.Queue()
+        result_q = ctx.Queue()
+        processes: List[multiprocessing.Process] = [
+            ctx.Process(
+                target=_worker_main,
+                kwargs={
+                    "task_q": task_q, "result_q": result_q,
+                    "concurrency": self.concurrency,
+                    "num_threads": self.num_threads, "num_tries": num_tries
+                },
+                daemon=True
+            ) for _ in range(self.max_workers)
+        ]
+        for process in processes:
+            process.start()
+
+        iterable = self._bind_tasks(
+            iterable, tuple_to_args=tuple_to_args,
+            dict_to_kwargs=dict_to_kwargs
+        )
+        task_ids = itertools.count()
+        pending: Dict[int, Tuple[Callable, Tuple, Dict]] = dict()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < self.queue_size:
+                    try:
+                        f, call_args, call_kwargs = next(iterable)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    # Tasks are pickled here, since `task_q` pickles on a
+                    # feeder thread which only prints its errors.
+                    try:
+                        task: bytes = pickle.dumps(
+                            (f, call_args, call_kwargs),
+                            protocol=pickle.HIGHEST_PROTOCOL
+                        )
+                    except Exception as e:
+                        if raise_after_retries:
+                            raise
+                        logging.warning(
+                            f"An item could not be pickled: {type(e).__name__}: {str(e)}"
+                        )
+                        self._record_failure(
+                            failed_tasks, f, call_args, call_kwargs, error=e,
+                            attempts=0
+                        )
+                        yield None
+                        continue
+                    task_id = next(task_ids)
+                    pending[task_id] = (f, call_args, call_kwargs)
+                    task_q.put((task_id, task))
+                if not pending:
+                    break
+                task_id, ok, payload = self._get_result(
+                    result_q=result_q, processes=processes
+                )
+                f, call_args, call_kwargs = pending.pop(task_id)
+                value: Any = pickle.loads(payload)
+                if ok:
+                    yield value
+                elif raise_after_retries:
+                    raise value
+                else:
+                    logging.warning(
+                        f"An exception occurred while processing an item: {type(value).__name__}: {str(value)}"
+                    )
+                    self._record_failure(
+                        failed_tasks, f, call_args, call_kwargs, error=value,
+                        attempts=num_tries
+                    )
+                    yield None
+        finally:
+            for _ in processes:
+                task_q.put(None)
+            for process in processes:
+                process.join(timeout=self.poll_interval if pending else None)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
@@ -0,0 +1,140 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import collections
+import sys
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .metrics import Metrics
+
+
+class _Account:
+    # The bytes one stage currently holds against a `MemoryBudget`.
+    def __init__(self, budget: "MemoryBudget", stage: str):
+        self.budget = budget
+        self.stage = stage
+        self.held: int = 0
+        self.closed = False
+
+
+    def acquire(self, num_bytes: int, timeout: Optional[float] = None) -> bool:
+        return self.budget._acquire(self, num_bytes, timeout=timeout)
+
+
+    def release(self, num_bytes: int) -> None:
+        self.budget._release(self, num_bytes)
+
+
+    def submit(self, executor: Executor, f: Callable, *args, **kwargs) -> Future:
+        num_bytes: int = self.budget.measure(args, kwargs)
+        self.acquire(num_bytes)
+        try:
+            future: Future = executor.submit(f, *args, **kwargs)
+        except BaseException:
+            self.release(num_bytes)
+            raise
+        future.add_done_callback(lambda _: self.release(num_bytes))
+        return future
+
+
+    def close(self) -> None:
+        # Returns whatever is still held and wakes an `acquire` left waiting.
+        self.budget._release(self, self.held, close=True)
+
+
+class MemoryBudget:
+    """
+    Caps at `max_bytes` the approximate size, as measured by `size_fn`, of the
+    items held in flight by every stage sharing the budget. Each stage
+    acquires an item's bytes before taking it on, so a full budget throttles
+    forking upstream, and releases them once the item has left its hands. A
+    stage only waits for room while it holds bytes itself, which it will
+    release without further input, so one oversized item cannot deadlock the
+    pipeline. Per-stage use is reported by `usage` and `summary`.
+    """
+    def __init__(
+        self, max_bytes: int, size_fn: Optional[Callable] = sys.getsizeof,
+        metrics: Optional[Metrics] = None
+    ):
+        assert max_bytes > 0, "`max_bytes` must be positive."
+        if metrics is None:
+            metrics = Metrics()
+        self.max_bytes = max_bytes
+        self.size_fn = size_fn
+        self.metrics = metrics
+        self.used: int = 0
+        self.peak: int = 0
+        self._stage_used: Dict[str, int] = collections.defaultdict(int)
+        self._stage_peak: Dict[str, int] = collections.defaultdict(int)
+        self._condition = threading.Condition()
+
+
+    def measure(self, args: Tuple, kwargs: Dict[str, Any]) -> int:
+        # Approximate bytes held by a call: its arguments, which for a
+        # forked item are the item itself or its unpacked fields.
+        size_fn: Callable = self.size_fn
+        return sum(map(size_fn, args)) + sum(map(size_fn, kwargs.values()))
+
+
+    def account(self, stage: str) -> _Account:
+        return _Account(self, stage)
+
+
+    def _acquire(
+        self, account: _Account, num_bytes: int, timeout: Optional[float] = None
+    ) -> bool:
+        with self._condition:
+            admit: Callable = lambda: account.closed or account.held == 0 or \
+                self.used + num_bytes <= self.max_bytes
+            if not admit():
+                self.metrics.increment("memory_waits")
+                start: float = time.perf_counter()
+                admitted: bool = self._condition.wait_for(admit, timeout=timeout)
+                self.metrics.observe(
+                    "memory_wait_seconds", time.perf_counter() - start
+                )
+                if not admitted:
+                    return False
+            self.used += num_bytes
+            self.peak = max(self.peak, self.used)
+            account.held += num_bytes
+            stage_used: int = self._stage_used[account.stage] + num_bytes
+            self._stage_used[account.stage] = stage_used
+            self._stage_peak[account.stage] = max(
+                self._stage_peak[account.stage], stage_used
+            )
+            return True
+
+
+    def _release(
+        self, account: _Account, num_bytes: int, close: Optional[bool] = False
+    ) -> None:
+        with self._condition:
+            num_bytes = min(num_bytes, account.held)
+            self.used -= num_bytes
+            account.held -= num_bytes
+            self._stage_used[account.stage] -= num_bytes
+            if close:
+                account.closed = True
+            self._condition.notify_all()
+
+
+    def usage(self) -> Dict[str, int]:
+        with self._condition:
+            return dict(self._stage_used)
+
+
+    def summary(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "max_bytes": self.max_bytes,
+                "used": self.used,
+                "peak": self.peak,
+                "stages": {
+                    stage: {"used": used, "peak": self._stage_peak[stage]}
+                    for stage, used in self._stage_used.items()
+                }
+            }
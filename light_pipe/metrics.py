@@ -0,0 +1,75 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import collections
+import threading
+from typing import Deque, Dict, Optional
+
+
+class Metrics:
+    """
+    Thread-safe counters and observation windows. Only the most recent
+    `max_samples` observations of each name are kept for quantiles.
+    """
+    def __init__(self, max_samples: Optional[int] = 1024):
+        self.max_samples = max_samples
+        self.counters: Dict[str, float] = collections.defaultdict(int)
+        self._samples: Dict[str, Deque[float]] = dict()
+        self._totals: Dict[str, float] = collections.defaultdict(float)
+        self._counts: Dict[str, int] = collections.defaultdict(int)
+        self._lock = threading.Lock()
+
+
+    def increment(self, name: str, value: Optional[float] = 1) -> None:
+        with self._lock:
+            self.counters[name] += value
+
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            samples: Optional[Deque[float]] = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = collections.deque(
+                    maxlen=self.max_samples
+                )
+            samples.append(value)
+            self._totals[name] += value
+            self._counts[name] += 1
+
+
+    def count(self, name: str) -> int:
+        return self._counts.get(name, 0)
+
+
+    def quantile(self, name: str, q: float) -> Optional[float]:
+        with self._lock:
+            samples: Optional[Deque[float]] = self._samples.get(name)
+            if not samples:
+                return None
+            ordered = sorted(samples)
+        index: int = min(int(q * len(ordered)), len(ordered) - 1)
+        return ordered[index]
+
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        summary: Dict[str, Dict[str, float]] = {
+            "counters": dict(self.counters)
+        }
+        for name in list(self._samples):
+            count: int = self._counts[name]
+            summary[name] = {
+                "count": count,
+                "mean": self._totals[name] / count,
+                "p50": self.quantile(name, 0.5),
+                "p95": self.quantile(name, 0.95),
+                "max": self.quantile(name, 1.0),
+            }
+        return summary
+
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self._samples.clear()
+            self._totals.clear()
+            self._counts.clear()
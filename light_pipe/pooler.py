@@ -0,0 +1,473 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import concurrent.futures
+import functools
+import logging
+import time
+from concurrent.futures import Future
+from typing import (Any, Callable, Dict, Generator, Iterable, List, Optional,
+                    Tuple, Union)
+
+from .memory import MemoryBudget
+from .metrics import Metrics
+from .parallelizer import Parallelizer
+from .pools import PoolRegistry, default_registry
+from .resources import release_resources
+
+
+def _is_process_executor(executor: Any) -> bool:
+    # Executor wrappers such as `SchedulerClient` expose the executor they
+    # submit to as `base_executor`.
+    while executor is not None:
+        if isinstance(executor, concurrent.futures.ProcessPoolExecutor):
+            return True
+        executor = getattr(executor, "base_executor", None)
+    return False
+
+
+def _failed(future: Future) -> bool:
+    return not future.cancelled() and future.exception() is not None
+
+
+def _make_submit(
+    executor: concurrent.futures.Executor,
+    memory_budget: Optional[MemoryBudget] = None, stage: Optional[str] = None
+) -> Callable:
+    if memory_budget is None:
+        return executor.submit
+    return functools.partial(memory_budget.account(stage).submit, executor)
+
+
+class Pooler(Parallelizer):
+    def __init__(
+        self, max_workers: Optional[int] = None,
+        DefaultExecutor: Optional[type] = None,
+        executor: Optional[Union[
+            concurrent.futures.ThreadPoolExecutor, 
+            concurrent.futures.ProcessPoolExecutor
+        ]] = None, pool: Optional[str] = None,
+        registry: Optional[PoolRegistry] = None,
+        memory_budget: Optional[MemoryBudget] = None,
+        stage: Optional[str] = None, *args, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        if executor is None and pool is None:
+            assert max_workers is not None, \
+                "`max_workers` must be set if neither `executor` nor `pool` is passed."
+        if registry is None:
+            registry = default_registry
+        self.max_workers = max_workers
+        self.DefaultExecutor = DefaultExecutor
+        self.executor = executor
+        self.pool = pool
+        self.registry = registry
+        self.memory_budget = memory_budget
+        self.stage = stage or type(self).__name__
+
+
+    def __call__(
+        self, iterable: Iterable, max_workers: Optional[int] = None,
+        executor: Optional[Union[
+            concurrent.futures.ThreadPoolExecutor, 
+            concurrent.futures.ProcessPoolExecutor
+        ]] = None, pool: Optional[str] = None,
+        tuple_to_args: Optional[bool] = True,
+        dict_to_kwargs: Optional[bool] = True, num_tries: Optional[int] = 1, 
+        raise_after_retries: Optional[bool] = True, 
+        failed_tasks: Optional[List[Tuple[Callable, Tuple, Dict]]] = None
+    ) -> Generator:
+        if executor is None:
+            executor = self.executor
+        if max_workers is None:
+            max_workers = self.max_workers
+        if pool is None:
+            pool = self.pool
+        if executor is None and pool is not None:
+            max_workers = self.registry.register(
+                pool, Executor=self.DefaultExecutor, max_workers=max_workers
+            )
+            executor = self.registry.get(pool)
+
+        if executor is not None:
+            # futures = [
+            #     executor.submit(f, item, *args, **kwargs) for 
+            #     f, item, args, kwargs in iterable
+            # ]
+            yield from self._submit_tasks(
+                iterable=iterable, executor=executor, tuple_to_args=tuple_to_args, 
+                dict_to_kwargs=dict_to_kwargs, num_tries=num_tries, 
+                raise_after_retries=raise_after_retries, 
+                failed_tasks=failed_tasks
+            )
+        else:
+            with self.DefaultExecutor(max_workers=max_workers) as executor:
+                # futures = [
+                #     executor.submit(f, item, *args, **kwargs) for 
+                #     f, item, args, kwargs in iterable
+                # ]
+                # for future in concurrent.futures.as_completed(futures):
+                #     yield future.result()
+                yield from self._submit_tasks(
+                    iterable=iterable, executor=executor, 
+                    tuple_to_args=tuple_to_args, dict_to_kwargs=dict_to_kwargs,
+                    num_tries=num_tries, raise_after_retries=raise_after_retries, 
+                    failed_tasks=failed_tasks
+                )
+            release_resources(dead_threads_only=True)
+
+
+    def _submit_tasks(
+        self, iterable: Iterable, 
+        executor: Union[
+            concurrent.futures.ThreadPoolExecutor, 
+            concurrent.futures.ProcessPoolExecutor
+        ],
+        tuple_to_args: Optional[bool] = True, 
+        dict_to_kwargs: Optional[bool] = True, num_tries: Optional[int] = 1, 
+        raise_after_retries: Optional[bool] = True, 
+        failed_tasks: Optional[List[Tuple[Callable, Tuple, Dict]]] = None
+    ) -> Generator:
+        if _is_process_executor(executor):
+            if num_tries != 1 or not raise_after_retries:
+                logging.warn("Error handling is not implemented for `ProcessPooler` instances.")
+            error_handler: None = None
+        else:
+            error_handler: Callable = self._make_error_handler_decorator(
+                num_tries=num_tries, raise_after_retries=raise_after_retries,
+                failed_tasks=failed_tasks
+            )
+        calls: Generator = self._bind_tasks(
+            iterable, tuple_to_args=tuple_to_args,
+            dict_to_kwargs=dict_to_kwargs, decorator=error_handler
+        )
+        if self.memory_budget is not None:
+            yield from self._budgeted_submit(calls, executor)
+            return
+        futures: list = [
+            executor.submit(f, *args, **kwargs) for f, args, kwargs in calls
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
+
+
+    def _budgeted_submit(
+        self, calls: Iterable, executor: concurrent.futures.Executor
+    ) -> Generator:
+        # An item's bytes stay held until its result is yielded, so results
+        # waiting in finished futures count against the budget. While there
+        # is no room, finished results are yielded to release their bytes.
+        account = self.memory_budget.account(self.stage)
+        pending: Dict[Future, int] = dict()
+        try:
+            for f, args, kwargs in calls:
+                num_bytes: int = self.memory_budget.measure(args, kwargs)
+                while not account.acquire(num_bytes, timeout=0):
+                    done, _ = concurrent.futures.wait(
+                        pending, timeout=0.05,
+                        return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        account.release(pending.pop(future))
+                        yield future.result()
+                try:
+                    future: Future = executor.submit(f, *args, **kwargs)
+                except BaseException:
+                    account.release(num_bytes)
+                    raise
+                pending[future] = num_bytes
+            for future in concurrent.futures.as_completed(list(pending)):
+                account.release(pending.pop(future))
+                yield future.result()
+        finally:
+            account.close()
+
+
+class ThreadPooler(Pooler):
+    def __init__(
+        self, *args, 
+        DefaultExecutor: Optional[type] = concurrent.futures.ThreadPoolExecutor,
+        **kwargs
+    ):
+        super().__init__(*args, DefaultExecutor=DefaultExecutor, **kwargs)
+
+
+class ProcessPooler(Pooler):
+    def __init__(
+        self, *args, 
+        DefaultExecutor: Optional[type] = concurrent.futures.ProcessPoolExecutor,
+        **kwargs
+    ):
+        super().__init__(*args, DefaultExecutor=DefaultExecutor, **kwargs)              
+
+
+class BlockingPooler(Parallelizer):
+    def __init__(
+        self, max_workers: Optional[int] = None, queue_size: Optional[int] = None,
+        DefaultBlockingExecutor: Optional[type] = None,
+        executor: Optional[Union[
+            concurrent.futures.ThreadPoolExecutor, 
+            concurrent.futures.ProcessPoolExecutor
+        ]] = None, pool: Optional[str] = None,
+        registry: Optional[PoolRegistry] = None,
+        speculative: Optional[bool] = False,
+        speculation_quantile: Optional[float] = 0.9,
+        speculation_multiplier: Optional[float] = 2.0,
+        speculation_min_samples: Optional[int] = 10,
+        speculation_interval: Optional[float] = 0.05,
+        metrics: Optional[Metrics] = None,
+        memory_budget: Optional[MemoryBudget] = None,
+        stage: Optional[str] = None, *args, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        if executor is None and pool is None:
+            assert max_workers is not None and queue_size is not None, \
+                "Both `max_workers` and `queue_size` must be set if neither `executor` nor `pool` is passed."
+        elif pool is None:
+            assert max_workers is not None or queue_size is not None, \
+                "Either `max_workers` or `queue_size` must be set when `executor` is passed."
+        if registry is None:
+            registry = default_registry
+        if metrics is None:
+            metrics = Metrics()
+        self.max_workers = max_workers
+        self.DefaultBlockingExecutor = DefaultBlockingExecutor
+        self.queue_size = queue_size
+        self.executor = executor
+        self.pool = pool
+        self.registry = registry
+        # Speculative execution re-submits straggling items, so it must only
+        # be enabled for idempotent transformations.
+        self.speculative = speculative
+        self.speculation_quantile = speculation_quantile
+        self.speculation_multiplier = speculation_multiplier
+        self.speculation_min_samples = speculation_min_samples
+        self.speculation_interval = speculation_interval
+        self.metrics = metrics
+        self.memory_budget = memory_budget
+        self.stage = stage or type(self).__name__
+
+
+    def _blocking_submitter(
+        self,  iterable: Iterable, queue_size: int,
+        executor: Optional[Union[
+            concurrent.futures.ThreadPoolExecutor, 
+            concurrent.futures.ProcessPoolExecutor
+        ]] = None,
+        tuple_to_args: Optional[bool] = True, 
+        dict_to_kwargs: Optional[bool] = True, num_tries: Optional[int] = 1, 
+        raise_after_retries: Optional[bool] = True, 
+        failed_tasks: Optional[List[Tuple[Callable, Tuple, Dict]]] = None,
+        max_workers: Optional[int] = None
+    ) -> Generator:
+        if _is_process_executor(executor):
+            if num_tries != 1 or not raise_after_retries:
+                logging.warn("Error handling is not implemented for `BlockingProcessPooler` instances.")
+            error_handler: None = None
+        else:
+            error_handler: Callable = self._make_error_handler_decorator(
+                num_tries=num_tries, raise_after_retries=raise_after_retries,
+                failed_tasks=failed_tasks
+            )
+        iterable = self._bind_tasks(
+            iterable, tuple_to_args=tuple_to_args,
+            dict_to_kwargs=dict_to_kwargs, decorator=error_handler
+        )
+        submit: Callable = _make_submit(
+            executor, memory_budget=self.memory_budget, stage=self.stage
+        )
+        if self.speculative:
+            yield from self._speculative_submitter(
+                iterable=iterable, queue_size=queue_size, executor=executor,
+                submit=submit, max_workers=max_workers
+            )
+            return
+        futures = dict()
+        exhausted = False
+        num_submitted = 0
+        while True:
+            while not exhausted and num_submitted < queue_size:
+                try:
+                    f, args, kwargs = next(iterable)
+                except StopIteration:
+                    exhausted = True
+                    break
+                futures[submit(f, *args, **kwargs)] = "Done"
+                num_submitted += 1
+            if futures: # There's at least one task left to await
+                done, _ = concurrent.futures.wait(
+                    futures, return_when=concurrent.futures.FIRST_COMPLETED
+                ) # Will block until at least one future finishes or cancels
+                future = done.pop()
+                yield future.result()
+                num_submitted -= 1
+                del(futures[future])
+            else:
+                assert num_submitted == 0, \
+                    f"There are still {num_submitted} tasks left to await."
+                break
+
+
+    def _speculative_submitter(
+        self, iterable: Iterable, queue_size: int,
+        executor: Union[
+            concurrent.futures.ThreadPoolExecutor, 
+            concurrent.futures.ProcessPoolExecutor
+        ],
+        submit: Optional[Callable] = None, max_workers: Optional[int] = None
+    ) -> Generator:
+        if submit is None:
+            submit = executor.submit
+        if max_workers is None: # An executor passed without a worker count
+            max_workers = queue_size
+        # Each item is a group of attempts:
+        # [resubmit, attempts, started_at, submitted_at].
+        futures: Dict[Future, list] = dict()
+        groups: List[list] = list()
+        exhausted = False
+        polled_at: float = time.monotonic()
+        while True:
+            while not exhausted and len(groups) < queue_size:
+                try:
+                    f, args, kwargs = next(iterable)
+                except StopIteration:
+                    exhausted = True
+                    break
+                resubmit: Callable = functools.partial(
+                    submit, f, *args, **kwargs
+                )
+                future: Future = resubmit()
+                group: list = [resubmit, [future], None, time.monotonic()]
+                futures[future] = group
+                groups.append(group)
+            if not groups:
+                break
+
+            done, _ = concurrent.futures.wait(
+                futures, timeout=self.speculation_interval,
+                return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            now: float = time.monotonic()
+            # Successful attempts are taken first, and a failed attempt only
+            # settles its item once no other attempt is still running.
+            for future in sorted(done, key=_failed):
+                group = futures.pop(future, None)
+                if group is None: # Another attempt at this item already won
+                    continue
+                _, attempts, started_at, submitted_at = group
+                if _failed(future) and \
+                    any(not attempt.done() for attempt in attempts):
+                    continue
+                for attempt in attempts:
+                    if attempt is not future:
+                        attempt.cancel()
+                        futures.pop(attempt, None)
+                groups.remove(group)
+                if started_at is None: # Started and finished between polls
+                    started_at = max(submitted_at, polled_at)
+                self.metrics.observe("task_latency", now - started_at)
+                if len(attempts) > 1:
+                    self.metrics.increment(
+                        "speculative_wins" if future is not attempts[0] else 
+                        "speculative_losses"
+                    )
+                yield future.result()
+
+            num_running: int = 0
+            for group in groups:
+                if group[2] is None and any(a.running() for a in group[1]):
+                    group[2] = now
+                num_running += sum(a.running() for a in group[1])
+            polled_at = now
+            if self.metrics.count("task_latency") < self.speculation_min_samples:
+                continue
+            threshold: float = self.speculation_multiplier * self.metrics.quantile(
+                "task_latency", self.speculation_quantile
+            )
+            for group in groups:
+                if num_running >= max_workers:
+                    break
+                resubmit, attempts, started_at, _ = group
+                if len(attempts) == 1 and started_at is not None and \
+                    now - started_at > threshold:
+                    future = resubmit()
+                    attempts.append(future)
+                    futures[future] = group
+                    num_running += 1
+                    self.metrics.increment("speculative_launches")
+
+
+    def __call__(
+        self, iterable: Iterable, max_workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        executor: Optional[Union[
+            concurrent.futures.ThreadPoolExecutor, 
+            concurrent.futures.ProcessPoolExecutor
+        ]] = None, pool: Optional[str] = None,
+        tuple_to_args: Optional[bool] = True, 
+        dict_to_kwargs: Optional[bool] = True, num_tries: Optional[int] = 1, 
+        raise_after_retries: Optional[bool] = True, 
+        failed_tasks: Optional[List[Tuple[Callable, Tuple, Dict]]] = None
+    ) -> Generator:
+        if max_workers is None:
+            max_workers = self.max_workers
+        if queue_size is None:
+            queue_size = self.queue_size
+        if executor is None:
+            executor = self.executor     
+        if pool is None:
+            pool = self.pool
+        if executor is None and pool is not None:
+            max_workers = self.registry.register(
+                pool, Executor=self.DefaultBlockingExecutor, 
+                max_workers=max_workers
+            )
+            executor = self.registry.get(pool)
+        if queue_size is None: # Keep every worker busy with one item queued
+            queue_size = 2 * max_workers
+
+        if executor is not None:
+            yield from self._blocking_submitter(
+                iterable=iterable, queue_size=queue_size, executor=executor,
+                tuple_to_args=tuple_to_args, dict_to_kwargs=dict_to_kwargs,
+                num_tries=num_tries, raise_after_retries=raise_after_retries,
+                failed_tasks=failed_tasks, max_workers=max_workers
+            )
+        else:
+            executor = self.DefaultBlockingExecutor(max_workers=max_workers)
+            try:
+                yield from self._blocking_submitter(
+                    iterable=iterable, queue_size=queue_size, executor=executor,
+                    tuple_to_args=tuple_to_args, dict_to_kwargs=dict_to_kwargs,
+                    num_tries=num_tries, raise_after_retries=raise_after_retries,
+                    failed_tasks=failed_tasks, max_workers=max_workers
+                )
+            finally:
+                # Losing speculative attempts are left to finish on their own
+                # rather than holding up the stage.
+                executor.shutdown(
+                    wait=not self.speculative, cancel_futures=self.speculative
+                )
+            release_resources(dead_threads_only=True)
+
+
+class BlockingThreadPooler(BlockingPooler):
+    def __init__(
+        self, *args, 
+        DefaultBlockingExecutor: Optional[type] = concurrent.futures.ThreadPoolExecutor,
+        **kwargs
+    ):
+        super().__init__(
+            *args, DefaultBlockingExecutor=DefaultBlockingExecutor, **kwargs
+        )
+
+
+class BlockingProcessPooler(BlockingPooler):
+    def __init__(
+        self, *args, 
+        DefaultBlockingExecutor: Optional[type] = concurrent.futures.ProcessPoolExecutor,
+        **kwargs
+    ):
+        super().__init__(
+            *args, DefaultBlockingExecutor=DefaultBlockingExecutor, **kwargs
+        )
@@ -0,0 +1,185 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import atexit
+import concurrent.futures
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from .resources import release_resources
+
+
+def _noop(*args, **kwargs) -> None:
+    return None
+
+
+class PoolRegistry:
+    """
+    A registry of named, lazily-started executors which persist across
+    pipeline invocations. Pools are started the first time they are requested
+    and live until `shutdown()` is called (or the interpreter exits), so
+    process workers are only spawned once. The total number of workers handed
+    out to thread and process pools is capped by `max_threads` and
+    `max_processes` respectively; a pool registered without `max_workers`
+    gets half of the workers which remain, so that later pools are not
+    starved.
+    """
+    def __init__(
+        self, max_threads: Optional[int] = None,
+        max_processes: Optional[int] = None
+    ):
+        if max_processes is None:
+            max_processes = os.cpu_count() or 1
+        if max_threads is None:
+            max_threads = min(32, (os.cpu_count() or 1) + 4)
+        self.max_threads = max_threads
+        self.max_processes = max_processes
+
+        self._specs: Dict[str, Tuple[type, int, Dict[str, Any]]] = dict()
+        self._executors: Dict[str, concurrent.futures.Executor] = dict()
+        self._lock = threading.RLock()
+
+
+    @staticmethod
+    def _is_process_type(Executor: type) -> bool:
+        return issubclass(Executor, concurrent.futures.ProcessPoolExecutor)
+
+
+    def _budget_used(self, processes: bool) -> int:
+        return sum(
+            max_workers for Executor, max_workers, _ in self._specs.values()
+            if self._is_process_type(Executor) == processes
+        )
+
+
+    def register(
+        self, name: str,
+        Executor: Optional[type] = concurrent.futures.ThreadPoolExecutor,
+        max_workers: Optional[int] = None, **executor_kwargs
+    ) -> int:
+        with self._lock:
+            if name in self._specs:
+                RegisteredExecutor, registered_workers, _ = self._specs[name]
+                if RegisteredExecutor is not Executor:
+                    raise ValueError(
+                        f"Pool `{name}` is already registered with executor type {RegisteredExecutor.__name__}, not {Executor.__name__}."
+                    )
+                return registered_workers
+            processes: bool = self._is_process_type(Executor)
+            budget: int = self.max_processes if processes else self.max_threads
+            remaining: int = budget - self._budget_used(processes=processes)
+            if remaining <= 0:
+                raise RuntimeError(
+                    f"No {'process' if processes else 'thread'} workers remain in the budget of {budget} for pool `{name}`."
+                )
+            if max_workers is None:
+                max_workers = max(1, remaining // 2)
+            elif max_workers > remaining:
+                logging.warning(
+                    f"Pool `{name}` requested {max_workers} workers but only {remaining} remain in the budget; using {remaining}."
+                )
+                max_workers = remaining
+            self._specs[name] = (Executor, max_workers, executor_kwargs)
+            return max_workers
+
+
+    def get(self, name: str) -> concurrent.futures.Executor:
+        with self._lock:
+            executor = self._executors.get(name)
+            if executor is None:
+                assert name in self._specs, f"Pool `{name}` is not registered."
+                Executor, max_workers, executor_kwargs = self._specs[name]
+                executor = Executor(max_workers=max_workers, **executor_kwargs)
+                self._executors[name] = executor
+            return executor
+
+
+    def get_or_register(
+        self, name: str,
+        Executor: Optional[type] = concurrent.futures.ThreadPoolExecutor,
+        max_workers: Optional[int] = None, **executor_kwargs
+    ) -> concurrent.futures.Executor:
+        # Like `register`, raises if `name` has another executor type.
+        with self._lock:
+            self.register(
+                name, Executor=Executor, max_workers=max_workers,
+                **executor_kwargs
+            )
+            return self.get(name)
+
+
+    def warm_up(self, *names: str) -> None:
+        if not names:
+            with self._lock:
+                names = tuple(self._specs)
+        for name in names:
+            executor = self.get(name)
+            _, max_workers, _ = self._specs[name]
+            # Executors spawn workers on demand, so keep every worker busy at
+            # once to force all of them to start.
+            if not self._is_process_type(type(executor)):
+                barrier = threading.Barrier(max_workers)
+                futures = [
+                    executor.submit(barrier.wait) for _ in range(max_workers)
+                ]
+            else:
+                futures = [
+                    executor.submit(_noop) for _ in range(max_workers)
+                ]
+            concurrent.futures.wait(futures)
+
+
+    def shutdown(
+        self, names: Optional[Iterable[str]] = None, wait: Optional[bool] = True
+    ) -> None:
+        with self._lock:
+            if names is None:
+                names = list(self._specs)
+            for name in names:
+                executor = self._executors.pop(name, None)
+                self._specs.pop(name, None)
+                if executor is not None:
+                    executor.shutdown(wait=wait)
+        if wait:
+            release_resources(dead_threads_only=True)
+
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._specs
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+
+default_registry = PoolRegistry()
+atexit.register(default_registry.shutdown)
+
+
+def register_pool(
+    name: str, Executor: Optional[type] = concurrent.futures.ThreadPoolExecutor,
+    max_workers: Optional[int] = None, **executor_kwargs
+) -> int:
+    return default_registry.register(
+        name, Executor=Executor, max_workers=max_workers, **executor_kwargs
+    )
+
+
+def get_pool(name: str) -> concurrent.futures.Executor:
+    return default_registry.get(name)
+
+
+def warm_up_pools(*names: str) -> None:
+    default_registry.warm_up(*names)
+
+
+def shutdown_pools(
+    names: Optional[Iterable[str]] = None, wait: Optional[bool] = True
+) -> None:
+    default_registry.shutdown(names=names, wait=wait)
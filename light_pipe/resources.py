@@ -0,0 +1,269 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import asyncio
+import atexit
+import functools
+import inspect
+import logging
+import os
+import threading
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+
+_local = threading.local()
+_lock = threading.Lock()
+_resource_sets: List["_ResourceSet"] = list()
+_finalizer_pid: Optional[int] = None
+
+
+class _ResourceSet:
+    def __init__(self, key: str, thread: threading.Thread):
+        self.key = key
+        self.thread = thread
+        self.pid = os.getpid()
+        self.instances: Dict[str, Any] = dict()
+        self.teardowns: List[Callable] = list()
+        self.closed = False
+        # Asynchronous teardowns are awaited on the loop which opened them.
+        try:
+            self.loop: Optional[asyncio.AbstractEventLoop] = asyncio.get_running_loop()
+        except RuntimeError:
+            self.loop = None
+
+
+    def _add(self, name: str, instance: Any, teardown: Optional[Callable]) -> Any:
+        self.instances[name] = instance
+        if teardown is not None:
+            self.teardowns.append(teardown)
+        return instance
+
+
+    def open(self, name: str, factory: Callable) -> Any:
+        resource: Any = factory()
+        if inspect.isgenerator(resource):
+            instance: Any = next(resource)
+            teardown: Callable = functools.partial(_exhaust, resource)
+        elif hasattr(resource, "__enter__") and hasattr(resource, "__exit__"):
+            instance = resource.__enter__()
+            teardown = functools.partial(resource.__exit__, None, None, None)
+        else:
+            instance = resource
+            teardown = getattr(resource, "aclose", None) or \
+                getattr(resource, "close", None)
+        return self._add(name, instance, teardown)
+
+
+    async def aopen(self, name: str, factory: Callable) -> Any:
+        resource: Any = factory()
+        if inspect.isawaitable(resource):
+            resource = await resource
+        if inspect.isasyncgen(resource):
+            instance: Any = await resource.__anext__()
+            return self._add(
+                name, instance, functools.partial(_aexhaust, resource)
+            )
+        if hasattr(resource, "__aenter__") and hasattr(resource, "__aexit__"):
+            instance = await resource.__aenter__()
+            return self._add(
+                name, instance,
+                functools.partial(resource.__aexit__, None, None, None)
+            )
+        return self.open(name, lambda: resource)
+
+
+    def _await(self, awaitable: Any) -> None:
+        loop: Optional[asyncio.AbstractEventLoop] = self.loop
+        if loop is None or loop.is_closed() or loop.is_running():
+            if inspect.iscoroutine(awaitable):
+                awaitable.close()
+            raise RuntimeError(
+                "An asynchronous teardown could not be awaited since its event loop is unavailable."
+            )
+        loop.run_until_complete(awaitable)
+
+
+    def close(self):
+        self.closed = True
+        while self.teardowns:
+            teardown: Callable = self.teardowns.pop()
+            try:
+                result: Any = teardown()
+                if inspect.isawaitable(result):
+                    self._await(result)
+            except Exception as e:
+                _log_teardown_error(e)
+        self.instances.clear()
+
+
+    async def aclose(self):
+        self.closed = True
+        while self.teardowns:
+            teardown: Callable = self.teardowns.pop()
+            try:
+                result: Any = teardown()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                _log_teardown_error(e)
+        self.instances.clear()
+
+
+def _log_teardown_error(e: Exception) -> None:
+    logging.warning(
+        f"An exception occurred while tearing down a resource: {type(e).__name__}: {str(e)}"
+    )
+
+
+def _exhaust(generator) -> None:
+    try:
+        next(generator)
+    except StopIteration:
+        pass
+    else:
+        generator.close()
+
+
+async def _aexhaust(generator) -> None:
+    try:
+        await generator.__anext__()
+    except StopAsyncIteration:
+        pass
+    else:
+        await generator.aclose()
+
+
+def _register_finalizer() -> None:
+    # Process pool workers exit without running `atexit` hooks, so teardown is
+    # registered with multiprocessing's own exit handlers in child processes.
+    global _finalizer_pid
+    pid: int = os.getpid()
+    if _finalizer_pid == pid:
+        return
+    if _finalizer_pid is not None:
+        # Resources inherited from a forked parent belong to the parent.
+        with _lock:
+            _resource_sets.clear()
+    _finalizer_pid = pid
+    import multiprocessing
+    import multiprocessing.util
+    if multiprocessing.parent_process() is not None:
+        multiprocessing.util.Finalize(None, release_resources, exitpriority=100)
+    else:
+        atexit.register(release_resources)
+
+
+def release_resources(
+    dead_threads_only: Optional[bool] = False, key: Optional[str] = None,
+    thread: Optional[threading.Thread] = None
+) -> None:
+    with _lock:
+        released = [
+            s for s in _resource_sets if 
+            (not dead_threads_only or not s.thread.is_alive()) and
+            (key is None or s.key == key) and
+            (thread is None or s.thread is thread)
+        ]
+        for resource_set in released:
+            _resource_sets.remove(resource_set)
+    for resource_set in released:
+        resource_set.close()
+
+
+class ResourceBinding:
+    """
+    Wraps `fn` so that the objects built by `resources` (a mapping of keyword
+    names to zero-argument factories) are passed to it as keyword arguments.
+    Each factory runs once per worker thread or process. A factory may return
+    the resource itself (closed with its `aclose()` or `close()` method, if
+    any), a context manager, or a generator which yields the resource and then
+    cleans it up. When `fn` is a coroutine function, factories may also be
+    coroutine functions or return asynchronous context managers or
+    generators; these are opened and torn down on the worker's event loop.
+    """
+    def __init__(self, fn: Callable, resources: Dict[str, Callable]):
+        self.fn = fn
+        self.resources = resources
+        self.key = uuid.uuid4().hex
+        self.is_async: bool = inspect.iscoroutinefunction(fn)
+        functools.update_wrapper(self, fn)
+
+
+    def _current(self) -> Optional[_ResourceSet]:
+        resource_sets: Optional[Dict[str, _ResourceSet]] = getattr(
+            _local, "resource_sets", None
+        )
+        if resource_sets is None:
+            resource_sets = _local.resource_sets = dict()
+        resource_set: Optional[_ResourceSet] = resource_sets.get(self.key)
+        if resource_set is None or resource_set.closed or \
+            resource_set.pid != os.getpid():
+            return None
+        return resource_set
+
+
+    def _start(self) -> _ResourceSet:
+        _register_finalizer()
+        return _ResourceSet(key=self.key, thread=threading.current_thread())
+
+
+    def _register(self, resource_set: _ResourceSet) -> Dict[str, Any]:
+        _local.resource_sets[self.key] = resource_set
+        with _lock:
+            _resource_sets.append(resource_set)
+        return resource_set.instances
+
+
+    def open(self) -> Dict[str, Any]:
+        resource_set: Optional[_ResourceSet] = self._current()
+        if resource_set is not None:
+            return resource_set.instances
+        resource_set = self._start()
+        try:
+            for name, factory in self.resources.items():
+                resource_set.open(name, factory)
+        except BaseException: # Tear down whatever was already opened
+            resource_set.close()
+            raise
+        return self._register(resource_set)
+
+
+    async def aopen(self) -> Dict[str, Any]:
+        resource_set: Optional[_ResourceSet] = self._current()
+        if resource_set is not None:
+            return resource_set.instances
+        # Tasks on one loop share a single opening of the resources.
+        opening: Dict[str, asyncio.Future] = _local.__dict__.setdefault(
+            "opening", dict()
+        )
+        future: Optional[asyncio.Future] = opening.get(self.key)
+        if future is None:
+            future = opening[self.key] = asyncio.ensure_future(self._aopen())
+            future.add_done_callback(lambda _: opening.pop(self.key, None))
+        return await asyncio.shield(future)
+
+
+    async def _aopen(self) -> Dict[str, Any]:
+        resource_set: _ResourceSet = self._start()
+        try:
+            for name, factory in self.resources.items():
+                await resource_set.aopen(name, factory)
+        except BaseException:
+            await resource_set.aclose()
+            raise
+        return self._register(resource_set)
+
+
+    def close(self) -> None:
+        release_resources(key=self.key)
+
+
+    async def _acall(self, *args, **kwargs) -> Any:
+        return await self.fn(*args, **(await self.aopen()), **kwargs)
+
+
+    def __call__(self, *args, **kwargs) -> Any:
+        if self.is_async:
+            return self._acall(*args, **kwargs)
+        return self.fn(*args, **self.open(), **kwargs)
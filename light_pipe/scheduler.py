@@ -0,0 +1,184 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import concurrent.futures
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+
+class Scheduler:
+    """
+    Orders work submitted by several pipelines to one executor. Only
+    `max_in_flight` tasks are handed to the executor at a time; the rest wait
+    in per-pipeline queues. The next task comes from the pipeline which has
+    received the least service relative to its weight, and within a pipeline
+    from the highest-priority item. With `downstream_first`, items from later
+    stages go before items from earlier stages of equal priority, so in-flight
+    items finish before new ones start.
+
+    Pipelines submit through `client()` objects, which can be passed as the
+    `executor` of any pooled parallelizer.
+    """
+    def __init__(
+        self, executor: Optional[concurrent.futures.Executor] = None,
+        max_workers: Optional[int] = None,
+        Executor: Optional[type] = concurrent.futures.ThreadPoolExecutor,
+        max_in_flight: Optional[int] = None,
+        downstream_first: Optional[bool] = False
+    ):
+        self._owns_executor: bool = executor is None
+        if executor is None:
+            executor = Executor(max_workers=max_workers)
+        if max_in_flight is None:
+            max_in_flight = getattr(executor, "_max_workers", None) or 1
+        self.base_executor = executor
+        self.max_in_flight = max_in_flight
+        self.downstream_first = downstream_first
+
+        self._queues: Dict[str, List[Tuple]] = dict()
+        self._weights: Dict[str, float] = dict()
+        self._service: Dict[str, float] = dict()
+        self._clock: float = 0.0
+        self._in_flight: int = 0
+        self._dispatching: bool = False
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+
+    def client(
+        self, pipeline: Optional[str] = "default",
+        weight: Optional[float] = 1.0,
+        priority: Optional[Union[int, Callable]] = 0,
+        stage: Optional[int] = 0
+    ) -> "SchedulerClient":
+        assert weight > 0, "`weight` must be positive."
+        with self._lock:
+            self._weights[pipeline] = weight
+            self._queues.setdefault(pipeline, list())
+            self._service.setdefault(pipeline, self._clock)
+        return SchedulerClient(
+            scheduler=self, pipeline=pipeline, priority=priority, stage=stage
+        )
+
+
+    def submit(
+        self, pipeline: str, priority: int, stage: int, fn: Callable,
+        *args, **kwargs
+    ) -> Future:
+        future: Future = Future()
+        if self.downstream_first:
+            key: Tuple = (-priority, -stage, next(self._seq))
+        else:
+            key = (-priority, next(self._seq))
+        with self._lock:
+            queue: List[Tuple] = self._queues.setdefault(pipeline, list())
+            self._weights.setdefault(pipeline, 1.0)
+            if not queue:
+                # An idle pipeline does not bank service it did not use.
+                self._service[pipeline] = max(
+                    self._service.get(pipeline, 0.0), self._clock
+                )
+            heapq.heappush(queue, (key, future, fn, args, kwargs))
+        self._dispatch()
+        return future
+
+
+    def _next_task(self) -> Optional[Tuple]:
+        pipelines: List[str] = [p for p, queue in self._queues.items() if queue]
+        if not pipelines:
+            return None
+        pipeline: str = min(pipelines, key=self._service.__getitem__)
+        self._clock = self._service[pipeline]
+        self._service[pipeline] += 1.0 / self._weights[pipeline]
+        return heapq.heappop(self._queues[pipeline])
+
+
+    def _dispatch(self) -> None:
+        # Only one thread dispatches at a time. A task which completes during
+        # dispatch (e.g. a future already done when its callback is added)
+        # frees its slot, and the running loop fills it, rather than
+        # dispatching recursively.
+        with self._lock:
+            if self._dispatching:
+                return
+            self._dispatching = True
+        try:
+            while True:
+                with self._lock:
+                    task: Optional[Tuple] = None
+                    if self._in_flight < self.max_in_flight:
+                        task = self._next_task()
+                    if task is None:
+                        self._dispatching = False
+                        return
+                    _, future, fn, args, kwargs = task
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    self._in_flight += 1
+                try:
+                    inner: Future = self.base_executor.submit(fn, *args, **kwargs)
+                except Exception as e:
+                    with self._lock:
+                        self._in_flight -= 1
+                    future.set_exception(e)
+                    continue
+                inner.add_done_callback(
+                    lambda inner, future=future: self._complete(future, inner)
+                )
+        except BaseException:
+            with self._lock:
+                self._dispatching = False
+            raise
+
+
+    def _complete(self, future: Future, inner: Future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        if inner.cancelled():
+            future.set_exception(concurrent.futures.CancelledError())
+        elif inner.exception() is not None:
+            future.set_exception(inner.exception())
+        else:
+            future.set_result(inner.result())
+        self._dispatch()
+
+
+    def shutdown(self, wait: Optional[bool] = True) -> None:
+        if self._owns_executor:
+            self.base_executor.shutdown(wait=wait)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+
+class SchedulerClient:
+    def __init__(
+        self, scheduler: Scheduler, pipeline: str,
+        priority: Union[int, Callable], stage: int
+    ):
+        self.scheduler = scheduler
+        self.pipeline = pipeline
+        self.priority = priority
+        self.stage = stage
+
+
+    @property
+    def base_executor(self) -> concurrent.futures.Executor:
+        return self.scheduler.base_executor
+
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        priority: Any = self.priority
+        if callable(priority):
+            priority = priority(*args, **kwargs)
+        return self.scheduler.submit(
+            self.pipeline, priority, self.stage, fn, *args, **kwargs
+        )
@@ -0,0 +1,276 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import functools
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional
+
+from .metrics import Metrics
+from .transformer import StreamTransformer
+
+
+class _FlushSignal:
+    pass
+
+
+class _BatchWriter:
+    def __init__(self, sink: "Sink"):
+        self.sink = sink
+        self.batches: queue.Queue = queue.Queue(maxsize=sink.max_pending)
+        self.buffer: List[Any] = list()
+        self.buffer_bytes: int = 0
+        self.buffer_started: Optional[float] = None
+        self.error: Optional[BaseException] = None
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        if sink.background:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        else:
+            sink.open()
+
+
+    def _write(self, batch: List[Any]) -> None:
+        start: float = time.perf_counter()
+        self.sink.write_batch(batch)
+        self.sink.metrics.observe("flush_latency", time.perf_counter() - start)
+        self.sink.metrics.increment("batches_written")
+        self.sink.metrics.increment("items_written", len(batch))
+
+
+    def _run(self) -> None:
+        try:
+            self.sink.open()
+        except BaseException as e:
+            self.error = e
+        timeout: Optional[float] = self.sink.max_seconds
+        while True:
+            try:
+                batch: Any = self.batches.get(timeout=timeout)
+            except queue.Empty:
+                batch = self._take_if_stale()
+                if batch is None:
+                    continue
+            if isinstance(batch, _FlushSignal):
+                break
+            if self.error is not None: # Drain so that producers never block
+                continue
+            try:
+                self._write(batch)
+            except BaseException as e:
+                self.error = e
+        try:
+            self.sink.close()
+        except BaseException as e:
+            if self.error is None:
+                self.error = e
+
+
+    def _take(self) -> Optional[List[Any]]:
+        if not self.buffer:
+            return None
+        batch: List[Any] = self.buffer
+        self.buffer = list()
+        self.buffer_bytes = 0
+        self.buffer_started = None
+        return batch
+
+
+    def _take_if_stale(self) -> Optional[List[Any]]:
+        with self.lock:
+            if self.buffer_started is None or \
+                time.monotonic() - self.buffer_started < self.sink.max_seconds:
+                return None
+            return self._take()
+
+
+    def _flush(self, batch: Optional[List[Any]]) -> None:
+        if batch is None:
+            return
+        if self.thread is not None:
+            self.batches.put(batch)
+        else:
+            self._write(batch)
+
+
+    def add(self, item: Any) -> None:
+        if self.error is not None:
+            raise self.error
+        sink = self.sink
+        with self.lock:
+            if self.buffer_started is None:
+                self.buffer_started = time.monotonic()
+            self.buffer.append(item)
+            if sink.max_bytes is not None:
+                self.buffer_bytes += sink.size_fn(item)
+            full: bool = (
+                (sink.max_items is not None and len(self.buffer) >= sink.max_items) or
+                (sink.max_bytes is not None and self.buffer_bytes >= sink.max_bytes) or
+                (sink.max_seconds is not None and
+                 time.monotonic() - self.buffer_started >= sink.max_seconds)
+            )
+            batch: Optional[List[Any]] = self._take() if full else None
+        self._flush(batch)
+
+
+    def close(self) -> None:
+        with self.lock:
+            batch: Optional[List[Any]] = self._take()
+        try:
+            if self.error is None:
+                self._flush(batch)
+        finally:
+            if self.thread is not None:
+                self.batches.put(_FlushSignal())
+                self.thread.join()
+            else:
+                self.sink.close()
+        if self.error is not None:
+            raise self.error
+
+
+class Sink(StreamTransformer):
+    """
+    Accumulates items into batches of at most `max_items` items, `max_bytes`
+    bytes (as measured by `size_fn`) or `max_seconds` seconds, and writes each
+    batch with `write_batch`. With `background=True` batches are written on a
+    writer thread, and producers only block when `max_pending` batches are
+    waiting to be written. Items are passed downstream unchanged. Flush
+    latencies and counts are recorded in `metrics`.
+    """
+    __name__: str = "Sink"
+
+
+    def __init__(
+        self, write_batch: Optional[Callable] = None,
+        max_items: Optional[int] = 1000, max_bytes: Optional[int] = None,
+        max_seconds: Optional[float] = None,
+        size_fn: Optional[Callable] = sys.getsizeof,
+        background: Optional[bool] = True, max_pending: Optional[int] = 2,
+        metrics: Optional[Metrics] = None, *args, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        assert max_items is not None or max_bytes is not None or max_seconds is not None, \
+            "At least one of `max_items`, `max_bytes` or `max_seconds` must be set."
+        if write_batch is not None:
+            self.write_batch = write_batch
+        if metrics is None:
+            metrics = Metrics()
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.size_fn = size_fn
+        self.background = background
+        self.max_pending = max_pending
+        self.metrics = metrics
+
+
+    def open(self) -> None:
+        pass
+
+
+    def write_batch(self, batch: List[Any]) -> None:
+        raise NotImplementedError(
+            (
+                f"Either pass a `Callable` instance to __init__() or overwrite this "
+                f"method in a subclass of {Sink.__name__}."
+            )
+        )
+
+
+    def close(self) -> None:
+        pass
+
+
+    def transform_stream(self, iterable: Iterable) -> Generator:
+        writer = _BatchWriter(self)
+        try:
+            for item in iterable:
+                writer.add(item)
+                yield item
+        finally:
+            writer.close()
+
+
+class SQLiteSink(Sink):
+    def __init__(
+        self, database: str, sql: str, params_fn: Optional[Callable] = None,
+        connect_kwargs: Optional[Dict[str, Any]] = None, *args, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        if connect_kwargs is None:
+            connect_kwargs = dict()
+        self.database = database
+        self.sql = sql
+        self.params_fn = params_fn
+        self.connect_kwargs = connect_kwargs
+        self.connection: Optional[sqlite3.Connection] = None
+
+
+    def open(self) -> None:
+        self.connection = sqlite3.connect(self.database, **self.connect_kwargs)
+
+
+    def write_batch(self, batch: List[Any]) -> None:
+        if self.params_fn is not None:
+            batch = [self.params_fn(item) for item in batch]
+        with self.connection: # One transaction per batch
+            self.connection.executemany(self.sql, batch)
+
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class FileSink(Sink):
+    def __init__(
+        self, path: str, mode: Optional[str] = "a",
+        format_fn: Optional[Callable] = None,
+        encoding: Optional[str] = None, buffering: Optional[int] = 1 << 20,
+        *args, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        if format_fn is None:
+            if "b" in mode:
+                format_fn = bytes
+            else:
+                format_fn = "{}\n".format
+        self.path = path
+        self.mode = mode
+        self.format_fn = format_fn
+        self.encoding = encoding
+        self.buffering = buffering
+        self.file = None
+
+
+    def open(self) -> None:
+        self.file = open(
+            self.path, self.mode, buffering=self.buffering,
+            encoding=self.encoding
+        )
+
+
+    def write_batch(self, batch: List[Any]) -> None:
+        self.file.writelines(map(self.format_fn, batch))
+        self.file.flush()
+
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def make_sink(
+    write_batch: Callable
+) -> Callable:
+    @functools.wraps(write_batch)
+    def sink_wrapper(*args, **kwargs) -> Sink:
+        return Sink(write_batch=write_batch, *args, **kwargs)
+    return sink_wrapper
@@ -0,0 +1,190 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import collections
+import concurrent.futures
+import heapq
+import itertools
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+from typing import Any, Callable, Deque, Generator, Iterable, List, Optional
+
+from .transformer import StreamTransformer
+
+
+def _write_run(
+    items: List[Any], key: Optional[Callable], reverse: bool, path: str,
+    chunk_size: int
+) -> str:
+    items.sort(key=key, reverse=reverse)
+    with open(path, "wb") as f:
+        for start in range(0, len(items), chunk_size):
+            pickle.dump(
+                items[start:start + chunk_size], f,
+                protocol=pickle.HIGHEST_PROTOCOL
+            )
+    return path
+
+
+def _read_run(path: str) -> Generator:
+    with open(path, "rb") as f:
+        while True:
+            try:
+                chunk: List[Any] = pickle.load(f)
+            except EOFError:
+                return
+            yield from chunk
+
+
+def _merge_runs(
+    paths: List[str], key: Optional[Callable], reverse: bool, path: str,
+    chunk_size: int
+) -> str:
+    merged: Iterable = heapq.merge(
+        *(_read_run(run_path) for run_path in paths), key=key, reverse=reverse
+    )
+    with open(path, "wb") as f:
+        while True:
+            chunk: List[Any] = list(itertools.islice(merged, chunk_size))
+            if not chunk:
+                break
+            pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+    for run_path in paths:
+        os.remove(run_path)
+    return path
+
+
+def _chain_runs(first: List, second: List, runs: Iterable) -> Generator:
+    yield first
+    yield second
+    yield from runs
+
+
+class ExternalSort(StreamTransformer):
+    """
+    Sorts a stream which need not fit in memory. Items are collected into runs
+    of at most `max_items` items or `memory_budget` bytes (as measured by
+    `size_fn`); each run is sorted and spilled to a temporary file, in
+    parallel on `max_workers` processes if set, and the runs are merged lazily
+    as the stream is consumed. At most `merge_fan_in` runs are open at once;
+    when there are more, groups of runs are first merged into longer runs.
+    `key` must be picklable when `max_workers` is set.
+    """
+    __name__: str = "ExternalSort"
+
+
+    def __init__(
+        self, key: Optional[Callable] = None, reverse: Optional[bool] = False,
+        max_items: Optional[int] = None, memory_budget: Optional[int] = None,
+        size_fn: Optional[Callable] = sys.getsizeof,
+        max_workers: Optional[int] = None,
+        executor: Optional[concurrent.futures.Executor] = None,
+        tmp_dir: Optional[str] = None, chunk_size: Optional[int] = 1024,
+        merge_fan_in: Optional[int] = 64, *args, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        assert max_items is not None or memory_budget is not None, \
+            "At least one of `max_items` or `memory_budget` must be set."
+        assert merge_fan_in >= 2, "`merge_fan_in` must be at least 2."
+        self.key = key
+        self.reverse = reverse
+        self.max_items = max_items
+        self.memory_budget = memory_budget
+        self.size_fn = size_fn
+        self.max_workers = max_workers
+        self.executor = executor
+        self.tmp_dir = tmp_dir
+        self.chunk_size = chunk_size
+        self.merge_fan_in = merge_fan_in
+
+
+    def _runs(self, iterable: Iterable) -> Generator:
+        run: List[Any] = list()
+        run_bytes: int = 0
+        for item in iterable:
+            run.append(item)
+            if self.memory_budget is not None:
+                run_bytes += self.size_fn(item)
+            if (self.max_items is not None and len(run) >= self.max_items) or \
+                (self.memory_budget is not None and run_bytes >= self.memory_budget):
+                yield run
+                run, run_bytes = list(), 0
+        if run:
+            yield run
+
+
+    def _merge_passes(
+        self, paths: List[str], tmp_dir: str,
+        executor: Optional[concurrent.futures.Executor] = None
+    ) -> List[str]:
+        # Merges groups of runs until few enough remain to merge at once.
+        fan_in: int = self.merge_fan_in
+        merges = itertools.count()
+        while len(paths) > fan_in:
+            groups: List[List[str]] = [
+                paths[start:start + fan_in]
+                for start in range(0, len(paths), fan_in)
+            ]
+            args: List[tuple] = [
+                (
+                    group, self.key, self.reverse,
+                    os.path.join(tmp_dir, f"merge-{next(merges)}.pkl"),
+                    self.chunk_size
+                ) for group in groups
+            ]
+            if executor is None:
+                paths = [_merge_runs(*group_args) for group_args in args]
+            else:
+                futures: List[concurrent.futures.Future] = [
+                    executor.submit(_merge_runs, *group_args)
+                    for group_args in args
+                ]
+                paths = [future.result() for future in futures]
+        return paths
+
+
+    def transform_stream(self, iterable: Iterable) -> Generator:
+        tmp_dir: str = tempfile.mkdtemp(dir=self.tmp_dir)
+        executor: Optional[concurrent.futures.Executor] = self.executor
+        owns_executor: bool = executor is None and self.max_workers is not None
+        if owns_executor:
+            executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.max_workers
+            )
+        try:
+            runs = self._runs(iterable)
+            first: Optional[List[Any]] = next(runs, None)
+            second: Optional[List[Any]] = next(runs, None)
+            if second is None: # Everything fit in memory
+                if first is not None:
+                    first.sort(key=self.key, reverse=self.reverse)
+                    yield from first
+                return
+
+            paths: List[str] = list()
+            pending: Deque[concurrent.futures.Future] = collections.deque()
+            max_pending: int = self.max_workers or 1
+            for index, run in enumerate(_chain_runs(first, second, runs)):
+                path: str = os.path.join(tmp_dir, f"run-{index}.pkl")
+                args = (run, self.key, self.reverse, path, self.chunk_size)
+                if executor is None:
+                    paths.append(_write_run(*args))
+                    continue
+                # Bound the number of runs held in memory while sorting.
+                while len(pending) >= max_pending:
+                    paths.append(pending.popleft().result())
+                pending.append(executor.submit(_write_run, *args))
+            while pending:
+                paths.append(pending.popleft().result())
+            paths = self._merge_passes(paths, tmp_dir, executor)
+            yield from heapq.merge(
+                *(_read_run(path) for path in paths), key=self.key,
+                reverse=self.reverse
+            )
+        finally:
+            if owns_executor:
+                executor.shutdown(wait=True)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,314 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import glob
+import json
+import logging
+import mmap
+import os
+import queue
+import threading
+from typing import (Any, Callable, Generator, Iterable, List, Optional, Tuple,
+                    Union)
+
+from .data import Data
+
+
+class _EndOfStream:
+    pass
+
+
+class _ReadAheadError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _read_ahead(batches: Iterable[List], read_ahead: int) -> Generator:
+    # Produces batches on a background thread, holding at most `read_ahead`
+    # batches which the consumer has not yet taken.
+    q: queue.Queue = queue.Queue(maxsize=read_ahead)
+    stop = threading.Event()
+
+
+    def put(obj: Any) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(obj, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+
+    def produce() -> None:
+        try:
+            for batch in batches:
+                if not put(batch):
+                    return
+        except BaseException as e:
+            put(_ReadAheadError(e))
+            return
+        put(_EndOfStream())
+
+
+    t = threading.Thread(target=produce, daemon=True)
+    t.start()
+    try:
+        while True:
+            batch: Any = q.get()
+            if isinstance(batch, _EndOfStream):
+                break
+            if isinstance(batch, _ReadAheadError):
+                raise batch.error
+            yield from batch
+    finally:
+        stop.set()
+        t.join()
+
+
+def _map_file(path: str) -> Union[None, memoryview]:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(b"")
+        try:
+            # The mapping stays valid after the file is closed and is released
+            # once no slices of it remain.
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except (OSError, ValueError):
+            return None
+
+
+def _resolve_range(
+    path: str, byte_range: Optional[Tuple[int, int]] = None
+) -> Tuple[int, int]:
+    size: int = os.path.getsize(path)
+    if byte_range is None:
+        return 0, size
+    start, end = byte_range
+    return max(start, 0), size if end is None else min(end, size)
+
+
+def _mapped_line_batches(
+    buffer: memoryview, start: int, end: int, block_size: int, keepends: bool
+) -> Generator:
+    obj: Any = buffer.obj
+    pos: int = start
+    if pos > 0 and buffer[pos - 1] != ord(b"\n"):
+        newline: int = obj.find(b"\n", pos)
+        pos = len(buffer) if newline == -1 else newline + 1
+    while pos < end:
+        block_end: int = min(pos + block_size, end)
+        batch: List[memoryview] = list()
+        while pos < block_end:
+            newline = obj.find(b"\n", pos)
+            line_end: int = len(buffer) if newline == -1 else newline + 1
+            if keepends or newline == -1:
+                batch.append(buffer[pos:line_end])
+            else:
+                batch.append(buffer[pos:newline])
+            pos = line_end
+        yield batch
+
+
+def _buffered_line_batches(
+    path: str, start: int, end: int, block_size: int, keepends: bool
+) -> Generator:
+    with open(path, "rb", buffering=0) as f:
+        pos: int = start
+        if pos > 0:
+            f.seek(pos - 1)
+            if f.read(1) != b"\n":
+                f.readline()
+                pos = f.tell()
+        f.seek(pos)
+        remainder: bytes = b""
+        while pos < end:
+            block: bytes = f.read(block_size)
+            if not block:
+                if remainder:
+                    yield [memoryview(remainder)]
+                return
+            block = remainder + block
+            view = memoryview(block)
+            batch: List[memoryview] = list()
+            line_start: int = 0
+            while pos < end:
+                newline: int = block.find(b"\n", line_start)
+                if newline == -1:
+                    break
+                batch.append(view[line_start:newline + 1 if keepends else newline])
+                pos += newline + 1 - line_start
+                line_start = newline + 1
+            remainder = block[line_start:]
+            yield batch
+
+
+def iter_lines(
+    path: str, start: Optional[int] = 0, end: Optional[int] = None,
+    block_size: Optional[int] = 1 << 20, read_ahead: Optional[int] = 4,
+    use_mmap: Optional[bool] = True, keepends: Optional[bool] = False
+) -> Generator:
+    start, end = _resolve_range(path, (start, end))
+    buffer: Optional[memoryview] = _map_file(path) if use_mmap else None
+    if buffer is not None:
+        batches: Iterable = _mapped_line_batches(
+            buffer, start=start, end=end, block_size=block_size,
+            keepends=keepends
+        )
+    else:
+        batches = _buffered_line_batches(
+            path, start=start, end=end, block_size=block_size,
+            keepends=keepends
+        )
+    yield from _read_ahead(batches, read_ahead=read_ahead)
+
+
+def _record_batches(
+    path: str, record_size: int, start: int, end: int, block_size: int,
+    use_mmap: bool
+) -> Generator:
+    first: int = -(-start // record_size) * record_size
+    num_records: int = max(0, -(-(end - first) // record_size))
+    records_per_block: int = max(1, block_size // record_size)
+    buffer: Optional[memoryview] = _map_file(path) if use_mmap else None
+    f = None
+    if buffer is None:
+        f = open(path, "rb", buffering=0)
+        f.seek(first)
+    try:
+        for index in range(0, num_records, records_per_block):
+            count: int = min(records_per_block, num_records - index)
+            offset: int = first + index * record_size
+            if buffer is not None:
+                block: memoryview = buffer[offset:offset + count * record_size]
+            else:
+                block = memoryview(f.read(count * record_size))
+            full: int = len(block) // record_size
+            if full < count:
+                logging.warning(
+                    f"Ignoring a partial record of {len(block) - full * record_size} bytes at the end of {path}."
+                )
+            yield [
+                block[i * record_size:(i + 1) * record_size] for i in range(full)
+            ]
+    finally:
+        if f is not None:
+            f.close()
+
+
+def iter_records(
+    path: str, record_size: int, start: Optional[int] = 0,
+    end: Optional[int] = None, block_size: Optional[int] = 1 << 20,
+    read_ahead: Optional[int] = 4, use_mmap: Optional[bool] = True
+) -> Generator:
+    start, end = _resolve_range(path, (start, end))
+    batches: Iterable = _record_batches(
+        path, record_size=record_size, start=start, end=end,
+        block_size=block_size, use_mmap=use_mmap
+    )
+    yield from _read_ahead(batches, read_ahead=read_ahead)
+
+
+def iter_jsonl(
+    path: str, start: Optional[int] = 0, end: Optional[int] = None,
+    block_size: Optional[int] = 1 << 20, read_ahead: Optional[int] = 4,
+    use_mmap: Optional[bool] = True
+) -> Generator:
+    start, end = _resolve_range(path, (start, end))
+    buffer: Optional[memoryview] = _map_file(path) if use_mmap else None
+    if buffer is not None:
+        lines: Iterable = _mapped_line_batches(
+            buffer, start=start, end=end, block_size=block_size,
+            keepends=False
+        )
+    else:
+        lines = _buffered_line_batches(
+            path, start=start, end=end, block_size=block_size,
+            keepends=False
+        )
+    batches: Generator = (
+        [json.loads(bytes(line)) for line in batch if bytes(line).strip()]
+        for batch in lines
+    )
+    yield from _read_ahead(batches, read_ahead=read_ahead)
+
+
+def _make_source(
+    iter_fn: Callable, *args, store_results: Optional[bool] = False, **kwargs
+) -> Data:
+    def generator(*gargs, **gkwargs) -> Generator:
+        yield from iter_fn(*args, **kwargs)
+    return Data(generator=generator, store_results=store_results)
+
+
+def read_lines(
+    path: str, byte_range: Optional[Tuple[int, int]] = None,
+    store_results: Optional[bool] = False, **kwargs
+) -> Data:
+    start, end = (0, None) if byte_range is None else byte_range
+    return _make_source(
+        iter_lines, path, start=start, end=end, store_results=store_results,
+        **kwargs
+    )
+
+
+def read_jsonl(
+    path: str, byte_range: Optional[Tuple[int, int]] = None,
+    store_results: Optional[bool] = False, **kwargs
+) -> Data:
+    start, end = (0, None) if byte_range is None else byte_range
+    return _make_source(
+        iter_jsonl, path, start=start, end=end, store_results=store_results,
+        **kwargs
+    )
+
+
+def read_records(
+    path: str, record_size: int, byte_range: Optional[Tuple[int, int]] = None,
+    store_results: Optional[bool] = False, **kwargs
+) -> Data:
+    start, end = (0, None) if byte_range is None else byte_range
+    return _make_source(
+        iter_records, path, record_size, start=start, end=end,
+        store_results=store_results, **kwargs
+    )
+
+
+def _iter_glob(
+    pattern: str, reader: Optional[Callable] = None,
+    recursive: Optional[bool] = False, **reader_kwargs
+) -> Generator:
+    for path in sorted(glob.glob(pattern, recursive=recursive)):
+        if not os.path.isfile(path):
+            continue
+        if reader is None:
+            yield path
+        else:
+            yield from reader(path, **reader_kwargs)
+
+
+def read_glob(
+    pattern: str, reader: Optional[Callable] = None,
+    recursive: Optional[bool] = False, store_results: Optional[bool] = False,
+    **reader_kwargs
+) -> Data:
+    return _make_source(
+        _iter_glob, pattern, reader=reader, recursive=recursive,
+        store_results=store_results, **reader_kwargs
+    )
+
+
+def split_file(
+    path: str, num_shards: int, align: Optional[int] = 1,
+    store_results: Optional[bool] = False
+) -> Data:
+    # Yields `(path, start, end)` byte ranges which `iter_lines`,
+    # `iter_jsonl` and `iter_records` (with `align=record_size`) split on
+    # record boundaries, so each shard can be parsed by a different worker.
+    size: int = os.path.getsize(path)
+    step: int = -(-size // max(num_shards, 1))
+    step = max(align, -(-step // align) * align)
+    shards: List[Tuple[str, int, int]] = [
+        (path, start, min(start + step, size)) for start in range(0, size, step)
+    ]
+    return Data(shards, store_results=store_results)
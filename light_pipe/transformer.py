@@ -2,11 +2,15 @@ __author__ = "Richard Correro (richard@richardcorrero.com)"
 
 
 import functools
-from typing import (Callable, Dict, Generator, Iterable, Iterator, List,
-                    Optional, Tuple)
+import itertools
+from typing import (TYPE_CHECKING, Callable, Dict, Generator, Iterable,
+                    Iterator, List, Optional, Tuple)
 
 from .data import Data
-from .parallelizer import Parallelizer
+from .parallelizer import CallSpec, Parallelizer, Task
+
+if TYPE_CHECKING:
+    from .resources import ResourceBinding
 
 
 class Transformer:
@@ -16,15 +20,25 @@ class Transformer:
     def __init__(
         self, transform_item: Optional[Callable] = None,
         join_fn: Optional[Callable] = None,
-        parallelizer: Optional[Parallelizer] = Parallelizer(),
+        parallelizer: Optional[Parallelizer] = None,
         tuple_to_args: Optional[bool] = True, dict_to_kwargs: Optional[bool] = True,
         num_tries: Optional[int] = 1, raise_after_retries: Optional[bool] = True, 
         failed_tasks: Optional[List[Tuple[Callable, Tuple, Dict]]] = None,
+        resources: Optional[Dict[str, Callable]] = None,
         *args, **kwargs
     ):
         if transform_item is not None:
             self.transform_item = transform_item
+        self.resources = resources
+        self._resource_binding: Optional["ResourceBinding"] = None
+        if resources:
+            from .resources import ResourceBinding
+            self._resource_binding = ResourceBinding(
+                fn=self.transform_item, resources=resources
+            )
         self.join_fn = join_fn
+        if parallelizer is None: # One per transformer, since some keep state
+            parallelizer = Parallelizer()
         self.parallelizer = parallelizer
         self.tuple_to_args = tuple_to_args
         self.dict_to_kwargs = dict_to_kwargs
@@ -46,15 +60,26 @@ class Transformer:
         cls, f: Callable, iterable: Iterable, *args,
         recurse: Optional[bool] = True, **kwargs
     ) -> Generator:
-        if recurse:
-            for item in iterable:
-                if isinstance(item, Data) or isinstance(item, Iterator):
-                    yield from cls.fork(f, item, *args, recurse=recurse, **kwargs)
-                else:
-                    yield f, item, args, kwargs
-        else:
-            for item in iterable:
-                yield f, item, args, kwargs           
+        # Every task shares one `CallSpec`, so each holds only its item and
+        # sequence number.
+        yield from cls._fork(
+            CallSpec(f, args, kwargs), iterable, itertools.count(),
+            recurse=recurse
+        )
+
+
+    @classmethod
+    def _fork(
+        cls, spec: CallSpec, iterable: Iterable, seqs: Iterator[int],
+        recurse: Optional[bool] = True
+    ) -> Generator:
+        for item in iterable:
+            if recurse and (
+                isinstance(item, Data) or isinstance(item, Iterator)
+            ):
+                yield from cls._fork(spec, item, seqs, recurse=recurse)
+            else:
+                yield Task(spec, item, next(seqs))
 
 
     @classmethod
@@ -78,7 +103,24 @@ class Transformer:
         )
 
 
+    @property
+    def resource_initializer(self) -> Optional[Callable]:
+        # Suitable as an executor `initializer` to open resources eagerly.
+        if self._resource_binding is None:
+            return None
+        return self._resource_binding.open
+
+
+    def close_resources(self) -> None:
+        if self._resource_binding is not None:
+            self._resource_binding.close()
+
+
     def _make_decorator(self, *args, recurse: Optional[bool] = True, **kwargs):
+        if self._resource_binding is not None:
+            transform_item: Callable = self._resource_binding
+        else:
+            transform_item = self.transform_item
         def decorator(fn: Callable):
             @functools.wraps(fn)
             def wrapper(*wargs, **wkwargs):
@@ -89,7 +131,7 @@ class Transformer:
                 yield from join(
                     self.parallelizer(
                         self.fork(
-                            self.transform_item, fn(*wargs, **wkwargs), *args, 
+                            transform_item, fn(*wargs, **wkwargs), *args, 
                             recurse=recurse, **kwargs,
                         ),
                         tuple_to_args=self.tuple_to_args, 
@@ -104,6 +146,51 @@ class Transformer:
         return decorator
 
 
+    @staticmethod
+    def _replay_tasks(f: Callable, letters: Iterable) -> Generator:
+        # Recorded arguments are already bound, so each letter's args are
+        # passed as a tuple item and any kwargs through its own spec.
+        spec = CallSpec(f)
+        for seq, (_, args, kwargs) in enumerate(letters):
+            if kwargs:
+                yield Task(CallSpec(f, (), kwargs), tuple(args), seq)
+            else:
+                yield Task(spec, tuple(args), seq)
+
+
+    def replay(
+        self, store: Iterable, store_results: Optional[bool] = False
+    ) -> Data:
+        """
+        Returns a `Data` instance which re-runs the calls recorded in `store`
+        (a dead-letter store, or any iterable of `(fn, args, kwargs)` tuples)
+        through this transformer's parallelizer. Calls which fail again go to
+        `failed_tasks` as usual. A store's letters are only removed once every
+        replayed call has returned, so a replay which is interrupted can be
+        run again.
+        """
+        def generator(*args, **kwargs) -> Generator:
+            if self._resource_binding is not None:
+                transform_item: Callable = self._resource_binding
+            else:
+                transform_item = self.transform_item
+            draining: bool = hasattr(store, "drain")
+            letters: Iterable = store.drain() if draining else list(store)
+            join: Callable = self.join_fn if self.join_fn is not None else self.join
+            yield from join(
+                self.parallelizer(
+                    self._replay_tasks(transform_item, letters),
+                    tuple_to_args=True, dict_to_kwargs=False,
+                    num_tries=self.num_tries,
+                    raise_after_retries=self.raise_after_retries,
+                    failed_tasks=self.failed_tasks
+                )
+            )
+            if draining:
+                store.acknowledge()
+        return Data(generator=generator, store_results=store_results)
+
+
     def transform(
         self, data: Data, *args, return_copy: Optional[bool] = True,
         block: Optional[bool] = False, **kwargs
@@ -146,6 +233,44 @@ class Transformer:
         return self(data, return_copy=False)
     
 
+class StreamTransformer(Transformer):
+    """
+    A `Transformer` which consumes the whole stream of items in the calling
+    thread rather than dispatching each item to a parallelizer. Subclasses
+    override `transform_stream`, which receives an iterable of items and
+    yields the items to pass downstream.
+    """
+    __name__: str = "StreamTransformer"
+
+
+    def __init__(
+        self, transform_stream: Optional[Callable] = None, *args, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        if transform_stream is not None:
+            self.transform_stream = transform_stream
+
+
+    def transform_stream(self, iterable: Iterable) -> Generator:
+        raise NotImplementedError(
+            (
+                f"Either pass a `Callable` instance to __init__() or overwrite this "
+                f"method in a subclass of {StreamTransformer.__name__}."
+            )
+        )
+
+
+    def _make_decorator(self, *args, recurse: Optional[bool] = True, **kwargs):
+        def decorator(fn: Callable):
+            @functools.wraps(fn)
+            def wrapper(*wargs, **wkwargs):
+                yield from self.transform_stream(
+                    self.join(fn(*wargs, **wkwargs), recurse=recurse)
+                )
+            return wrapper
+        return decorator
+
+
 def make_transformer(
     transform_item: Callable
 ) -> Callable:
@@ -0,0 +1,173 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import collections
+import heapq
+import math
+import time
+from typing import Any, Callable, Deque, Dict, Generator, Iterable, List, Optional
+
+from .metrics import Metrics
+from .transformer import StreamTransformer
+
+
+def _append(acc: List, item: Any) -> List:
+    acc.append(item)
+    return acc
+
+
+class WindowResult:
+    """
+    The aggregate of one window. `start` and `end` are item indices for count
+    windows and timestamps for time windows, and the window covers
+    `[start, end)`.
+    """
+    __slots__ = ("start", "end", "value", "count")
+
+
+    def __init__(self, start: Any, end: Any, value: Any, count: int):
+        self.start = start
+        self.end = end
+        self.value = value
+        self.count = count
+
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, WindowResult):
+            return NotImplemented
+        return (self.start, self.end, self.value, self.count) == \
+            (other.start, other.end, other.value, other.count)
+
+
+    def __repr__(self) -> str:
+        return (
+            f"WindowResult(start={self.start!r}, end={self.end!r}, "
+            f"value={self.value!r}, count={self.count!r})"
+        )
+
+
+class _Window(StreamTransformer):
+    # Each window folds its items into an accumulator as they arrive, so state
+    # is bounded by the number of open windows rather than by their size.
+    def __init__(
+        self, size: Any, slide: Optional[Any] = None,
+        initial: Optional[Callable] = list,
+        accumulate: Optional[Callable] = _append,
+        finalize: Optional[Callable] = None,
+        metrics: Optional[Metrics] = None, *args, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        if slide is None:
+            slide = size
+        assert size > 0 and slide > 0, "`size` and `slide` must be positive."
+        if metrics is None:
+            metrics = Metrics()
+        self.size = size
+        self.slide = slide
+        self.initial = initial
+        self.accumulate = accumulate
+        self.finalize = finalize
+        self.metrics = metrics
+
+
+    def _result(self, start: Any, end: Any, acc: Any, count: int) -> WindowResult:
+        self.metrics.increment("windows_emitted")
+        if self.finalize is not None:
+            acc = self.finalize(acc)
+        return WindowResult(start=start, end=end, value=acc, count=count)
+
+
+class CountWindow(_Window):
+    """
+    Aggregates every `size` consecutive items, starting a new window every
+    `slide` items (tumbling windows by default). Each window is emitted as
+    soon as its last item arrives; windows left incomplete when the stream
+    ends are emitted then if `emit_partial` is set.
+    """
+    __name__: str = "CountWindow"
+
+
+    def __init__(
+        self, size: int, slide: Optional[int] = None,
+        emit_partial: Optional[bool] = True, *args, **kwargs
+    ):
+        super().__init__(size, slide, *args, **kwargs)
+        self.emit_partial = emit_partial
+
+
+    def transform_stream(self, iterable: Iterable) -> Generator:
+        size, slide = self.size, self.slide
+        initial, accumulate = self.initial, self.accumulate
+        # Each open window is [start, accumulator, count].
+        windows: Deque[list] = collections.deque()
+        for index, item in enumerate(iterable):
+            if index % slide == 0:
+                windows.append([index, initial(), 0])
+            for window in windows:
+                window[1] = accumulate(window[1], item)
+                window[2] += 1
+            if windows and windows[0][2] == size:
+                start, acc, count = windows.popleft()
+                yield self._result(start, start + count, acc, count)
+        if self.emit_partial:
+            for start, acc, count in windows:
+                yield self._result(start, start + count, acc, count)
+
+
+class TimeWindow(_Window):
+    """
+    Aggregates items into windows of `size` seconds starting every `slide`
+    seconds (tumbling windows by default), aligned to multiples of `slide`.
+    Items are placed by `timestamp(item)`, or by arrival time if `timestamp`
+    is not set. Items may arrive out of order by up to `lateness` seconds: a
+    window is emitted once the largest timestamp seen, less `lateness`, has
+    passed its end, and items arriving after all of their windows were
+    emitted are dropped and counted as `late_items`. Windows still open when
+    the stream ends are emitted then. Since the watermark only advances as
+    items arrive, a window can close no sooner than the first item past it.
+    """
+    __name__: str = "TimeWindow"
+
+
+    def __init__(
+        self, size: float, slide: Optional[float] = None,
+        timestamp: Optional[Callable] = None, lateness: Optional[float] = 0.0,
+        *args, **kwargs
+    ):
+        super().__init__(size, slide, *args, **kwargs)
+        self.timestamp = timestamp
+        self.lateness = lateness
+
+
+    def transform_stream(self, iterable: Iterable) -> Generator:
+        size, slide = self.size, self.slide
+        initial, accumulate = self.initial, self.accumulate
+        # Windows are keyed by `start // slide` so that float error cannot
+        # split one window in two.
+        windows: Dict[int, list] = dict()
+        keys: List[int] = list()
+        watermark: float = -math.inf
+        for item in iterable:
+            t: float = time.time() if self.timestamp is None else self.timestamp(item)
+            watermark = max(watermark, t - self.lateness)
+            key: int = math.floor(t / slide)
+            if t < key * slide + size <= watermark: # All its windows are gone
+                self.metrics.increment("late_items")
+            else:
+                while key * slide + size > t:
+                    if key * slide + size > watermark: # Not yet emitted
+                        window: Optional[list] = windows.get(key)
+                        if window is None:
+                            window = windows[key] = [initial(), 0]
+                            heapq.heappush(keys, key)
+                        window[0] = accumulate(window[0], item)
+                        window[1] += 1
+                    key -= 1
+            while keys and keys[0] * slide + size <= watermark:
+                key = heapq.heappop(keys)
+                acc, count = windows.pop(key)
+                yield self._result(key * slide, key * slide + size, acc, count)
+        while keys:
+            key = heapq.heappop(keys)
+            acc, count = windows.pop(key)
+            yield self._result(key * slide, key * slide + size, acc, count)
@@ -0,0 +1,87 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import asyncio
+import os
+import time
+import unittest
+from unittest import mock
+
+from light_pipe import AutoParallelizer, make_data, make_transformer
+
+
+def spin(x: int):
+    total = 0
+    for i in range(200_000):
+        total += i
+    return x
+
+
+def wait(x: int):
+    time.sleep(0.01)
+    return x
+
+
+async def async_wait(x: int):
+    await asyncio.sleep(0.01)
+    return x
+
+
+def add_one(x: int):
+    return x + 1
+
+
+class TestAutoParallelizer(unittest.TestCase):
+    @staticmethod
+    @make_data
+    def gen(x: int):
+        yield from range(x)
+
+
+    def run_auto(self, fn, num_items: int = 40):
+        p = AutoParallelizer(num_samples=4)
+        data = self.gen() >> make_transformer(fn)(parallelizer=p)
+        results = data(x=num_items, block=True)
+        expected = [fn(i) for i in range(num_items)] if fn is not async_wait \
+            else list(range(num_items))
+        self.assertEqual(sorted(results), sorted(expected))
+        return p.decision
+
+
+    def test_io_bound(self):
+        decision = self.run_auto(wait)
+        self.assertEqual(decision["parallelizer"], "BlockingThreadPooler")
+        self.assertGreater(decision["max_workers"], 1)
+
+
+    def test_cpu_bound(self):
+        decision = self.run_auto(spin, num_items=12)
+        if (os.cpu_count() or 1) > 1:
+            self.assertEqual(decision["parallelizer"], "BlockingProcessPooler")
+        else:
+            self.assertEqual(decision["parallelizer"], "Parallelizer")
+        self.assertGreater(decision["cpu_fraction"], 0.5)
+
+
+
+    def test_cpu_bound_with_error_handling(self):
+        p = AutoParallelizer(num_samples=2)
+        samples = [
+            {"wall": 0.1, "cpu": 0.1, "coroutine": False, "payload_bytes": 64,
+             "pickle_seconds": 0.0}
+        ] * 2
+        with mock.patch("os.cpu_count", return_value=4):
+            parallelizer, _ = p._decide(samples)
+            self.assertEqual(type(parallelizer).__name__, "BlockingProcessPooler")
+            parallelizer, decision = p._decide(samples, error_handling=True)
+        self.assertEqual(type(parallelizer).__name__, "Parallelizer")
+        self.assertIn("failure", decision["reason"])
+
+
+    def test_coroutines_and_trivial_items(self):
+        self.assertEqual(self.run_auto(async_wait)["parallelizer"], "AsyncGatherer")
+        self.assertEqual(self.run_auto(add_one)["parallelizer"], "Parallelizer")
+
+
+if __name__ == "__main__":
+    unittest.main()
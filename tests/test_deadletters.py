@@ -0,0 +1,124 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import os
+import tempfile
+import unittest
+
+from light_pipe import (BlockingThreadPooler, FileDeadLetterStore,
+                        MemoryDeadLetterStore, SQLiteDeadLetterStore, make_data,
+                        make_transformer)
+
+
+outage = [True]
+
+
+@make_data
+def gen(num_items: int):
+    for i in range(num_items):
+        yield {"x": i}
+
+
+@make_transformer
+def fetch(x: int, scale: int = 1):
+    if outage[0] and x % 3 == 0:
+        raise ConnectionError(f"Could not fetch {x}.")
+    return x * scale
+
+
+class TestDeadLetters(unittest.TestCase):
+    def setUp(self):
+        outage[0] = True
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+    def test_memory_store_is_bounded(self):
+        store = MemoryDeadLetterStore(max_items=2)
+        for i in range(3):
+            store.record(fetch, (i,), dict(), error=ValueError(i), attempts=2)
+        store.append((fetch, (3,), dict())) # As a `failed_tasks` list
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.dropped, 2)
+        self.assertEqual([args for _, args, _ in store], [(2,), (3,)])
+        letter = next(iter(store))
+        self.assertEqual((letter.error_type, letter.attempts), ("ValueError", 2))
+
+
+    def test_replay(self):
+        path = os.path.join(self.tmpdir.name, "dead_letters")
+        for store in (
+            FileDeadLetterStore(path + ".pkl"),
+            SQLiteDeadLetterStore(path + ".db", batch_size=2)
+        ):
+            with self.subTest(store=type(store).__name__):
+                outage[0] = True
+                t = fetch(
+                    parallelizer=BlockingThreadPooler(max_workers=2, queue_size=4),
+                    num_tries=2, raise_after_retries=False, failed_tasks=store,
+                    scale=10
+                )
+                results = (gen() | t)(num_items=9, block=True)
+                self.assertEqual(
+                    sorted(r for r in results if r is not None),
+                    [10, 20, 40, 50, 70, 80]
+                )
+                store.close()
+
+                # Letters outlive the store which recorded them.
+                if isinstance(store, FileDeadLetterStore):
+                    store = FileDeadLetterStore(store.path)
+                else:
+                    store = SQLiteDeadLetterStore(store.database)
+                letters = sorted(store, key=lambda letter: letter.kwargs["x"])
+                self.assertEqual(
+                    [letter.kwargs for letter in letters],
+                    [{"x": x, "scale": 10} for x in (0, 3, 6)]
+                )
+                self.assertEqual(letters[0].error_type, "ConnectionError")
+                self.assertEqual(letters[0].attempts, 2)
+                self.assertTrue(letters[0].fn_name.endswith("fetch"))
+
+                outage[0] = False
+                replayed = t.replay(store)(block=True)
+                self.assertEqual(sorted(replayed), [0, 30, 60])
+                self.assertEqual(len(store), 0)
+                store.close()
+
+
+    def test_replay_failures_are_recorded_again(self):
+        store = MemoryDeadLetterStore()
+        t = fetch(raise_after_retries=False, failed_tasks=store)
+        self.assertEqual((gen() | t)(num_items=4, block=True), [None, 1, 2, None])
+        self.assertEqual(t.replay(store)(block=True), [None, None])
+        self.assertEqual(len(store), 2)
+
+
+    def test_interrupted_replay_keeps_letters(self):
+        path = os.path.join(self.tmpdir.name, "dead_letters")
+        for store in (
+            MemoryDeadLetterStore(), FileDeadLetterStore(path + ".pkl"),
+            SQLiteDeadLetterStore(path + ".db", batch_size=1)
+        ):
+            with self.subTest(store=type(store).__name__):
+                outage[0] = True
+                t = fetch(raise_after_retries=False, failed_tasks=store)
+                (gen() | t)(num_items=7, block=True)
+                self.assertEqual(len(store), 3)
+
+                outage[0] = False
+                replayed = t.replay(store)()
+                self.assertEqual(next(replayed), 0)
+                replayed.close() # Stops before the other letters return
+                self.assertEqual(len(store), 3)
+
+                self.assertEqual(sorted(t.replay(store)(block=True)), [0, 3, 6])
+                self.assertEqual(len(store), 0)
+                store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import multiprocessing
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+from light_pipe import (DistributedParallelizer, make_data, make_transformer,
+                        run_worker)
+
+
+def square(x: int):
+    return x ** 2
+
+
+def exit_once(x: int, marker: str):
+    if x == 0 and not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return x
+
+
+def fail(x: int):
+    raise ValueError(x)
+
+
+class TwoArgError(Exception):
+    # Pickles, but cannot be unpickled, since `args` holds one argument.
+    def __init__(self, x: int, y: int):
+        super().__init__(x)
+
+
+def fail_unpicklably(x: int):
+    if x == 0:
+        raise TwoArgError(x, x)
+    return x
+
+
+class TestDistributed(unittest.TestCase):
+    @staticmethod
+    @make_data
+    def gen(x: int):
+        yield from range(x)
+
+
+    def test_local_workers(self):
+        data = self.gen() >> make_transformer(square)(
+            parallelizer=DistributedParallelizer(local_workers=2, batch_size=4)
+        )
+        results = data(x=100, block=True)
+        self.assertEqual(sorted(results), [i ** 2 for i in range(100)])
+
+
+    @staticmethod
+    def _start(p: DistributedParallelizer, iterable: list):
+        # `p.address` is only known once the coordinator starts listening.
+        results = list()
+        thread = threading.Thread(target=lambda: results.extend(p(iterable)))
+        thread.start()
+        while p.address is None:
+            time.sleep(0.01)
+        return thread, results
+
+
+    def test_remote_worker(self):
+        p = DistributedParallelizer(
+            port=0, credits=2, batch_size=2, authkey=b"secret"
+        )
+        thread, results = self._start(
+            p, [(square, i, list(), dict()) for i in range(10)]
+        )
+        run_worker(*p.address, credits=2, authkey=b"secret")
+        thread.join()
+        self.assertEqual(sorted(results), [i ** 2 for i in range(10)])
+
+
+    def test_authkey(self):
+        with self.assertRaises(ValueError):
+            DistributedParallelizer(host="0.0.0.0")
+
+        p = DistributedParallelizer(port=0, authkey=b"secret")
+        thread, results = self._start(
+            p, [(square, i, list(), dict()) for i in range(4)]
+        )
+        with self.assertRaises(multiprocessing.AuthenticationError):
+            run_worker(*p.address, authkey=b"wrong")
+        run_worker(*p.address, authkey=b"secret")
+        thread.join()
+        self.assertEqual(sorted(results), [i ** 2 for i in range(4)])
+
+
+    def test_silent_client_does_not_stall(self):
+        p = DistributedParallelizer(
+            port=0, authkey=b"secret", handshake_timeout=30
+        )
+        thread, results = self._start(
+            p, [(square, i, list(), dict()) for i in range(4)]
+        )
+        silent = socket.create_connection(p.address)
+        try:
+            start = time.time()
+            run_worker(*p.address, authkey=b"secret")
+            thread.join()
+            self.assertLess(time.time() - start, 5)
+        finally:
+            silent.close()
+        self.assertEqual(sorted(results), [i ** 2 for i in range(4)])
+
+
+    def test_unpicklable_result(self):
+        p = DistributedParallelizer(local_workers=1)
+        failed_tasks = list()
+        results = list(
+            p(
+                iterable=[(fail_unpicklably, i, list(), dict()) for i in range(3)],
+                raise_after_retries=False, failed_tasks=failed_tasks
+            )
+        )
+        self.assertEqual(sorted(results, key=str), [1, 2, None])
+        self.assertEqual(len(failed_tasks), 1)
+
+
+    def test_redispatch_from_dead_worker(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            marker = os.path.join(tmpdir, "exited")
+            p = DistributedParallelizer(
+                local_workers=2, credits=1, batch_size=1
+            )
+            iterable = [(exit_once, i, [marker], dict()) for i in range(10)]
+            results = list(p(iterable=iterable))
+            self.assertTrue(os.path.exists(marker))
+            self.assertEqual(sorted(results), list(range(10)))
+
+
+    def test_errors(self):
+        p = DistributedParallelizer(local_workers=1)
+        with self.assertRaises(ValueError):
+            list(p(iterable=[(fail, 1, list(), dict())]))
+
+        failed_tasks = list()
+        results = list(
+            p(
+                iterable=[(fail, i, list(), dict()) for i in range(3)],
+                raise_after_retries=False, failed_tasks=failed_tasks
+            )
+        )
+        self.assertEqual(results, [None] * 3)
+        self.assertEqual(len(failed_tasks), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
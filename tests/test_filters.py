@@ -0,0 +1,84 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import os
+import tempfile
+import unittest
+
+from light_pipe import (BloomFilter, Dedup, ExactIndex, ThreadPooler, make_data,
+                        make_filter, make_transformer)
+
+
+class TestFilters(unittest.TestCase):
+    @staticmethod
+    @make_data
+    def gen(x: int):
+        for i in range(x):
+            yield {"tile": i % 50, "scene": i}
+
+
+    def test_filter_before_dispatch(self):
+        seen = list()
+
+
+        @make_filter
+        def is_even(item: dict):
+            return item["tile"] % 2 == 0
+
+
+        @make_transformer
+        def record(tile: int, scene: int):
+            seen.append(tile)
+            return tile
+
+
+        f = is_even()
+        data = self.gen() >> f >> record(
+            parallelizer=ThreadPooler(max_workers=2)
+        )
+        results = data(x=100, block=True)
+        self.assertEqual(len(results), 50)
+        self.assertTrue(all(tile % 2 == 0 for tile in seen))
+        self.assertEqual(f.metrics.counters["items_dropped"], 50)
+
+
+    def test_exact_dedup_with_spill(self):
+        for max_keys in (None, 7):
+            d = Dedup(key=lambda item: item["tile"], max_keys=max_keys)
+            data = self.gen() >> d
+            results = data(x=200, block=True)
+            self.assertEqual([r["tile"] for r in results], list(range(50)))
+            self.assertEqual(d.metrics.counters["items_dropped"], 150)
+            # Each pipeline invocation starts with an empty index.
+            self.assertEqual(len(data(x=200, block=True)), 50)
+
+
+
+    def test_spill_dir_is_not_reused(self):
+        with tempfile.TemporaryDirectory() as spill_dir:
+            for _ in range(3):
+                index = ExactIndex(max_keys=1, spill_dir=spill_dir)
+                self.assertEqual([index.add(10), index.add(11)], [True, True])
+                index.close()
+                self.assertEqual(os.listdir(spill_dir), [])
+
+
+    def test_approximate_dedup(self):
+        data = self.gen() >> Dedup(
+            key=lambda item: item["tile"], approximate=True, capacity=100,
+            error_rate=0.01
+        )
+        results = data(x=200, block=True)
+        self.assertLessEqual(len(results), 50)
+        self.assertGreaterEqual(len(results), 45)
+
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(i)
+        self.assertTrue(all(i in bloom for i in range(1000)))
+        false_positives = sum(i in bloom for i in range(1000, 11000))
+        self.assertLess(false_positives, 300)
+
+
+if __name__ == "__main__":
+    unittest.main()
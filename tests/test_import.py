@@ -0,0 +1,60 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import subprocess
+import sys
+import unittest
+
+
+HEAVY_MODULES = (
+    "asyncio", "concurrent.futures", "logging", "multiprocessing", "queue",
+    "socket", "sqlite3", "threading"
+)
+MAX_IMPORT_SECONDS = 0.25
+
+
+def run_python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code], capture_output=True, text=True,
+        check=True
+    )
+
+
+class TestImport(unittest.TestCase):
+    def test_backends_not_imported_eagerly(self):
+        result = run_python(
+            "import sys\n"
+            "from light_pipe import Data, make_transformer\n"
+            "assert list(Data([1, 2]) | make_transformer(abs)()) == [1, 2]\n"
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+        )
+        self.assertEqual(result.stdout.strip(), "")
+
+
+    def test_import_time(self):
+        # `-X importtime` reports cumulative microseconds per module on stderr.
+        result = run_python("import light_pipe", "-X", "importtime")
+        for line in result.stderr.splitlines():
+            fields = [field.strip() for field in line.split("|")]
+            if fields[-1] == "light_pipe":
+                cumulative = int(fields[1]) / 1e6
+                break
+        else:
+            self.fail("`light_pipe` not found in import time report.")
+        self.assertLess(cumulative, MAX_IMPORT_SECONDS)
+
+
+    def test_lazy_attributes(self):
+        import light_pipe
+        from light_pipe.parallelizer import BlockingThreadPooler
+        self.assertIs(light_pipe.BlockingThreadPooler, BlockingThreadPooler)
+        self.assertIn("AsyncGatherer", dir(light_pipe))
+        namespace = dict()
+        exec("from light_pipe import *", namespace)
+        self.assertTrue(all(name in namespace for name in light_pipe.__all__))
+        with self.assertRaises(AttributeError):
+            light_pipe.NotAParallelizer
+
+
+if __name__ == "__main__":
+    unittest.main()
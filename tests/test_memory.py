@@ -0,0 +1,156 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import asyncio
+import threading
+import time
+import unittest
+
+from light_pipe import (AsyncGatherer, BlockingThreadPooler, MemoryBudget,
+                        ThreadPooler, make_data, make_transformer)
+
+
+class TestMemoryBudget(unittest.TestCase):
+    @staticmethod
+    @make_data
+    def gen(num_items: int, num_bytes: int):
+        for _ in range(num_items):
+            yield bytes(num_bytes)
+
+
+    def test_throttles_in_flight_items(self):
+        budget = MemoryBudget(max_bytes=3500, size_fn=len)
+        lock = threading.Lock()
+        in_flight = [0, 0] # [current, max]
+
+
+        @make_transformer
+        def slow(item: bytes):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+            return len(item)
+
+
+        data = self.gen() >> slow(
+            parallelizer=BlockingThreadPooler(
+                max_workers=8, queue_size=50, memory_budget=budget,
+                stage="slow"
+            )
+        )
+        self.assertEqual(data(num_items=30, num_bytes=1000, block=True), [1000] * 30)
+        self.assertLessEqual(in_flight[1], 3)
+        summary = budget.summary()
+        self.assertEqual(summary["used"], 0)
+        self.assertEqual(summary["stages"]["slow"], {"used": 0, "peak": 3000})
+        self.assertGreater(budget.metrics.counters["memory_waits"], 0)
+
+
+    def test_pooler_holds_results_until_yielded(self):
+        budget = MemoryBudget(max_bytes=3500, size_fn=len)
+        calls = [0]
+
+
+        def echo(item: bytes):
+            calls[0] += 1
+            return item
+
+
+        p = ThreadPooler(max_workers=4, memory_budget=budget, stage="echo")
+        consumed = 0
+        for _ in p(iterable=[(echo, bytes(1000), list(), dict())] * 30):
+            consumed += 1
+            self.assertLessEqual(calls[0] - consumed, 3)
+            time.sleep(0.001)
+        self.assertEqual(consumed, 30)
+        self.assertEqual(budget.usage(), {"echo": 0})
+
+
+    def test_throttles_async_tasks(self):
+        budget = MemoryBudget(max_bytes=3500, size_fn=len)
+        in_flight = [0, 0] # [current, max]
+
+
+        async def slow(item: bytes):
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+            await asyncio.sleep(0.01)
+            in_flight[0] -= 1
+            return item[:1]
+
+
+        data = self.gen() >> make_transformer(slow)(
+            parallelizer=AsyncGatherer(memory_budget=budget, stage="slow")
+        )
+        results = data(num_items=30, num_bytes=1000, block=True)
+        self.assertEqual(results, [bytes(1)] * 30)
+        self.assertLessEqual(in_flight[1], 3)
+        self.assertEqual(budget.usage(), {"slow": 0})
+
+
+    def test_async_results_larger_than_items(self):
+        budget = MemoryBudget(
+            max_bytes=2500,
+            size_fn=lambda obj: len(obj) if isinstance(obj, bytes) else 100
+        )
+
+
+        async def grow(i: int):
+            await asyncio.sleep(0.01 * (i + 1))
+            return bytes(1000)
+
+
+        results = list()
+        p = AsyncGatherer(memory_budget=budget, stage="grow")
+        thread = threading.Thread(
+            target=lambda: results.extend(
+                p(iterable=[(grow, i, list(), dict()) for i in range(20)])
+            ), daemon=True
+        )
+        thread.start()
+        thread.join(timeout=10)
+        self.assertFalse(thread.is_alive(), "The stage deadlocked.")
+        self.assertEqual(results, [bytes(1000)] * 20)
+        self.assertLessEqual(budget.peak, 2500)
+        self.assertEqual(budget.usage(), {"grow": 0})
+
+
+    def test_shared_budget_and_oversized_items(self):
+        budget = MemoryBudget(max_bytes=100, size_fn=len)
+
+
+        @make_transformer
+        def double(item: bytes):
+            return item + item
+
+
+        async def halve(item: bytes):
+            await asyncio.sleep(0)
+            return item[:len(item) // 2]
+
+
+        data = self.gen() >> double(
+            parallelizer=ThreadPooler(
+                max_workers=2, memory_budget=budget, stage="double"
+            )
+        ) >> double(
+            parallelizer=BlockingThreadPooler(
+                max_workers=2, queue_size=4, memory_budget=budget,
+                stage="double_again"
+            )
+        ) >> make_transformer(halve)(
+            parallelizer=AsyncGatherer(memory_budget=budget, stage="halve")
+        )
+        # Every item is larger than the whole budget.
+        results = data(num_items=10, num_bytes=200, block=True)
+        self.assertEqual([len(result) for result in results], [400] * 10)
+        self.assertEqual(
+            budget.usage(), {"double": 0, "double_again": 0, "halve": 0}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
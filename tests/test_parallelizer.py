@@ -2,11 +2,30 @@ __author__ = "Richard Correro (richard@richardcorrero.com)"
 
 
 import asyncio
+import pickle
 import time
 import unittest
 
-from light_pipe import (AsyncGatherer, BlockingProcessPooler,
-                        BlockingThreadPooler)
+from light_pipe import (AsyncGatherer, AsyncProcessPooler,
+                        BlockingProcessPooler, BlockingThreadPooler,
+                        Parallelizer, Transformer)
+
+
+async def async_sleep(seconds: float):
+    await asyncio.sleep(seconds)
+    return seconds
+
+
+def square(x: int):
+    return x ** 2
+
+
+def fail(x: int):
+    raise ValueError(x)
+
+
+def add(x: int, y: int, z: int = 0):
+    return x + y + z
 
 
 class TestParallelizers(unittest.TestCase):
@@ -59,6 +78,61 @@ class TestParallelizers(unittest.TestCase):
             num_tasks_submitted[0] -= 1            
         
 
+    def test_speculative_blocking_thread_pooler(self):
+        attempts = list()
+
+
+        def straggle(x: int):
+            attempts.append(x)
+            if x == 30 and attempts.count(x) == 1:
+                time.sleep(3)
+            else:
+                time.sleep(0.01)
+            return x
+
+
+        p = BlockingThreadPooler(
+            max_workers=4, queue_size=3, speculative=True
+        )
+        start = time.time()
+        results = list(
+            p(iterable=((straggle, i, list(), dict()) for i in range(40)))
+        )
+        end = time.time()
+        self.assertEqual(sorted(results), list(range(40)))
+        self.assertLess(end - start, 2)
+        self.assertGreaterEqual(
+            p.metrics.counters["speculative_launches"], 1
+        )
+        self.assertGreaterEqual(p.metrics.counters["speculative_wins"], 1)
+
+
+    def test_speculative_prefers_success(self):
+        attempts = list()
+
+
+        def fail_on_retry(x: int):
+            attempts.append(x)
+            if x == 20:
+                if attempts.count(x) == 1:
+                    time.sleep(1)
+                    return x
+                raise ValueError(x)
+            time.sleep(0.01)
+            return x
+
+
+        p = BlockingThreadPooler(
+            max_workers=4, queue_size=3, speculative=True
+        )
+        results = list(
+            p(iterable=((fail_on_retry, i, list(), dict()) for i in range(30)))
+        )
+        self.assertEqual(sorted(results), list(range(30)))
+        self.assertEqual(attempts.count(20), 2)
+        self.assertEqual(p.metrics.counters["speculative_losses"], 1)
+
+
     def test_async_gatherer(self):
         async def sleep(seconds: int, *args, **kwargs):
             await asyncio.sleep(seconds)
@@ -75,5 +149,96 @@ class TestParallelizers(unittest.TestCase):
         self.assertLessEqual(end - start, 1.5 * seconds)
 
 
+    def test_async_process_pooler(self):
+        num_tasks = 200
+        seconds = 0.5
+        iterable = [
+            (async_sleep, seconds, list(), dict()) for _ in range(num_tasks)
+        ]
+        p = AsyncProcessPooler(max_workers=2, concurrency=100)
+        start = time.time()
+        results = list(p(iterable=iterable))
+        end = time.time()
+        self.assertEqual(results, [seconds] * num_tasks)
+        self.assertLessEqual(end - start, 4 * seconds)
+
+        iterable = ((square, i, list(), dict()) for i in range(20))
+        results = list(AsyncProcessPooler(max_workers=2, concurrency=4)(iterable))
+        self.assertEqual(sorted(results), [i ** 2 for i in range(20)])
+
+
+    def test_async_process_pooler_errors(self):
+        p = AsyncProcessPooler(max_workers=1, concurrency=2)
+        with self.assertRaises(ValueError):
+            list(p(iterable=[(fail, 1, list(), dict())]))
+
+        failed_tasks = list()
+        results = list(
+            p(
+                iterable=[(fail, i, list(), dict()) for i in range(3)],
+                num_tries=2, raise_after_retries=False,
+                failed_tasks=failed_tasks
+            )
+        )
+        self.assertEqual(results, [None] * 3)
+        self.assertEqual(
+            sorted(args for _, args, _ in failed_tasks), [(0,), (1,), (2,)]
+        )
+
+        # Tasks which cannot be pickled fail instead of never arriving.
+        with self.assertRaises((pickle.PicklingError, AttributeError)):
+            list(p(iterable=[(lambda x: x, 1, list(), dict())]))
+        failed_tasks = list()
+        results = list(
+            p(
+                iterable=[(lambda x: x, 1, list(), dict()), (square, 2, list(), dict())],
+                raise_after_retries=False, failed_tasks=failed_tasks
+            )
+        )
+        self.assertEqual(sorted(results, key=str), [4, None])
+        self.assertEqual(len(failed_tasks), 1)
+
+
+
+    def test_shared_call_spec(self):
+        tasks = list(Transformer.fork(add, [1, (2, 3), {"x": 4, "y": 5}], 10))
+        self.assertEqual([task.seq for task in tasks], [0, 1, 2])
+        self.assertTrue(all(task.spec is tasks[0].spec for task in tasks))
+        self.assertFalse(hasattr(tasks[0], "__dict__"))
+        f, item, args, kwargs = tasks[0]
+        self.assertEqual((f, item, args, kwargs), (add, 1, (10,), dict()))
+
+        tasks = list(Transformer.fork(add, [1, 2], 10, z=100))
+        for p in (
+            Parallelizer(), AsyncGatherer(),
+            BlockingThreadPooler(max_workers=2, queue_size=2),
+            BlockingThreadPooler(
+                max_workers=2, queue_size=2, speculative=True
+            )
+        ):
+            self.assertEqual(sorted(p(iterable=tasks)), [111, 112])
+
+        # An item field which the stage also passes is an error, as it was
+        # when items were unpacked into the call.
+        tasks = list(Transformer.fork(add, [{"x": 1, "y": 2}], y=3))
+        for p in (
+            Parallelizer(), AsyncGatherer(),
+            BlockingThreadPooler(max_workers=2, queue_size=2)
+        ):
+            if not isinstance(p, AsyncGatherer):
+                with self.assertRaises(TypeError):
+                    list(p(iterable=tasks))
+            failed_tasks = list()
+            self.assertEqual(
+                list(
+                    p(
+                        iterable=tasks, raise_after_retries=False,
+                        failed_tasks=failed_tasks
+                    )
+                ), [None]
+            )
+            self.assertEqual(len(failed_tasks), 1)
+
+
 if __name__ == "__main__":
     unittest.main()
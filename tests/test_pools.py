@@ -0,0 +1,99 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import concurrent.futures
+import os
+import unittest
+
+from light_pipe import (BlockingThreadPooler, PoolRegistry, ProcessPooler,
+                        ThreadPooler, make_data, make_transformer)
+
+
+def get_pid(x: int):
+    return os.getpid()
+
+
+class TestPools(unittest.TestCase):
+    def test_pool_reused_across_calls(self):
+        with PoolRegistry(max_threads=4) as registry:
+            p = ThreadPooler(pool="shared", registry=registry, max_workers=2)
+            list(p(iterable=[(get_pid, i, list(), dict()) for i in range(4)]))
+            executor = registry.get("shared")
+            list(p(iterable=[(get_pid, i, list(), dict()) for i in range(4)]))
+            self.assertIs(registry.get("shared"), executor)
+
+            q = BlockingThreadPooler(
+                pool="shared", registry=registry, queue_size=2
+            )
+            results = list(
+                q(iterable=[(get_pid, i, list(), dict()) for i in range(4)])
+            )
+            self.assertEqual(len(results), 4)
+            self.assertIs(registry.get("shared"), executor)
+
+
+    def test_budget(self):
+        with PoolRegistry(max_threads=3, max_processes=2) as registry:
+            self.assertEqual(registry.register("a", max_workers=2), 2)
+            self.assertEqual(registry.register("b", max_workers=2), 1)
+            with self.assertRaises(RuntimeError):
+                registry.register("c", max_workers=1)
+            self.assertEqual(
+                registry.register(
+                    "d", Executor=concurrent.futures.ProcessPoolExecutor
+                ), 1
+            )
+
+
+    def test_executor_type_mismatch(self):
+        with PoolRegistry(max_threads=4, max_processes=1) as registry:
+            registry.register("cpu", Executor=concurrent.futures.ProcessPoolExecutor)
+            for p in (
+                ThreadPooler(pool="cpu", registry=registry),
+                BlockingThreadPooler(pool="cpu", registry=registry)
+            ):
+                with self.subTest(parallelizer=type(p).__name__):
+                    with self.assertRaises(ValueError):
+                        list(p(iterable=[(get_pid, 0, list(), dict())]))
+
+
+    def test_default_pool_size_is_fair_share(self):
+        with PoolRegistry(max_threads=4) as registry:
+            self.assertEqual(registry.register("a"), 2)
+            self.assertEqual(registry.register("b"), 1)
+            self.assertEqual(registry.register("c"), 1)
+
+
+    def test_blocking_pooler_without_queue_size(self):
+        with PoolRegistry(max_threads=4) as registry:
+            p = BlockingThreadPooler(pool="a", registry=registry)
+            results = list(
+                p(iterable=[(get_pid, i, list(), dict()) for i in range(8)])
+            )
+            self.assertEqual(len(results), 8)
+
+
+    def test_process_pool_persists(self):
+        with PoolRegistry(max_processes=1) as registry:
+            registry.register(
+                "cpu", Executor=concurrent.futures.ProcessPoolExecutor
+            )
+            registry.warm_up("cpu")
+
+            @make_data
+            def gen(x: int):
+                yield from range(x)
+
+            t = make_transformer(get_pid)
+            data = gen() >> t(
+                parallelizer=ProcessPooler(pool="cpu", registry=registry)
+            )
+            first = set(data(x=4, block=True))
+            second = set(data(x=4, block=True))
+            self.assertEqual(len(first), 1)
+            self.assertEqual(first, second)
+            self.assertNotIn(os.getpid(), first)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import asyncio
+import os
+import threading
+import unittest
+
+from light_pipe import (AsyncGatherer, BlockingProcessPooler, Parallelizer,
+                        ThreadPooler, make_data, make_transformer)
+
+
+class Connection:
+    def __init__(self):
+        self.closed = False
+
+
+    def close(self):
+        self.closed = True
+
+
+class AsyncSession:
+    def __init__(self):
+        self.closed = False
+
+
+    async def close(self):
+        await asyncio.sleep(0)
+        self.closed = True
+
+
+def make_session():
+    return {"pid": os.getpid(), "token": object()}
+
+
+def get_session_id(x: int, session: dict):
+    return session["pid"], id(session["token"])
+
+
+class TestResources(unittest.TestCase):
+    @staticmethod
+    @make_data
+    def gen(x: int):
+        yield from range(x)
+
+
+    def test_thread_resources_opened_once_per_worker(self):
+        opened = list()
+        lock = threading.Lock()
+
+
+        def connect():
+            conn = Connection()
+            with lock:
+                opened.append(conn)
+            yield conn
+            conn.close()
+
+
+        @make_transformer
+        def use_conn(x: int, conn: Connection):
+            self.assertFalse(conn.closed)
+            return x
+
+
+        data = self.gen() >> use_conn(
+            parallelizer=ThreadPooler(max_workers=2),
+            resources={"conn": connect}
+        )
+        results = data(x=50, block=True)
+        self.assertEqual(sorted(results), list(range(50)))
+        self.assertLessEqual(len(opened), 2)
+        self.assertTrue(all(conn.closed for conn in opened))
+
+
+    def test_sequential_and_async_resources(self):
+        opened = list()
+
+
+        def connect():
+            conn = Connection()
+            opened.append(conn)
+            return conn
+
+
+        @make_transformer
+        async def use_conn(x: int, conn: Connection):
+            return x
+
+
+        t = use_conn(parallelizer=AsyncGatherer(), resources={"conn": connect})
+        self.assertEqual(sorted((self.gen() >> t)(x=10, block=True)), list(range(10)))
+        self.assertEqual(len(opened), 1)
+        self.assertTrue(opened[0].closed)
+
+        opened.clear()
+        t = make_transformer(lambda x, conn: x)(
+            parallelizer=Parallelizer(), resources={"conn": connect}
+        )
+        self.assertEqual((self.gen() >> t)(x=10, block=True), list(range(10)))
+        self.assertEqual(len(opened), 1)
+        t.close_resources()
+        self.assertTrue(opened[0].closed)
+
+
+    def test_partially_opened_resources_are_closed(self):
+        opened = list()
+
+
+        def connect():
+            conn = Connection()
+            opened.append(conn)
+            return conn
+
+
+        def broken():
+            raise ConnectionError("Could not connect.")
+
+
+        t = make_transformer(lambda x, conn, other: x)(
+            resources={"conn": connect, "other": broken}
+        )
+        with self.assertRaises(ConnectionError):
+            (self.gen() >> t)(x=3, block=True)
+        self.assertEqual(len(opened), 1)
+        self.assertTrue(opened[0].closed)
+
+
+    def test_async_resources(self):
+        sessions = list()
+        events = list()
+
+
+        def open_session():
+            session = AsyncSession()
+            sessions.append(session)
+            return session
+
+
+        async def open_client():
+            events.append("opened")
+            yield "client"
+            await asyncio.sleep(0)
+            events.append("closed")
+
+
+        @make_transformer
+        async def fetch(x: int, session: AsyncSession, client: str):
+            await asyncio.sleep(0.01)
+            return x
+
+
+        t = fetch(
+            parallelizer=AsyncGatherer(),
+            resources={"session": open_session, "client": open_client}
+        )
+        self.assertEqual(sorted((self.gen() >> t)(x=10, block=True)), list(range(10)))
+        self.assertEqual(len(sessions), 1)
+        self.assertTrue(sessions[0].closed)
+        self.assertEqual(events, ["opened", "closed"])
+
+
+    def test_process_resources_opened_once_per_worker(self):
+        data = self.gen() >> make_transformer(get_session_id)(
+            parallelizer=BlockingProcessPooler(max_workers=2, queue_size=4),
+            resources={"session": make_session}
+        )
+        results = data(x=20, block=True)
+        pids = {pid for pid, _ in results}
+        self.assertEqual(len(set(results)), len(pids))
+        self.assertNotIn(os.getpid(), pids)
+
+
+if __name__ == "__main__":
+    unittest.main()
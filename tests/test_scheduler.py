@@ -0,0 +1,99 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import concurrent.futures
+import threading
+import unittest
+
+from light_pipe import BlockingThreadPooler, Scheduler, ThreadPooler
+
+
+class InlineExecutor(concurrent.futures.Executor):
+    # Holds the first task until `release` and runs the rest on submit, so
+    # their futures are already done when callbacks are added.
+    def __init__(self):
+        self.first = None
+
+
+    def submit(self, fn, *args, **kwargs):
+        future = concurrent.futures.Future()
+        if self.first is None:
+            self.first = (future, fn, args, kwargs)
+        else:
+            future.set_result(fn(*args, **kwargs))
+        return future
+
+
+    def release(self):
+        future, fn, args, kwargs = self.first
+        future.set_result(fn(*args, **kwargs))
+
+
+class TestScheduler(unittest.TestCase):
+    def test_weighted_fair_share(self):
+        order = list()
+        gate = threading.Event()
+
+
+        def record(name: str):
+            order.append(name)
+
+
+        with Scheduler(max_workers=1) as scheduler:
+            bulk = scheduler.client("bulk", weight=1)
+            interactive = scheduler.client("interactive", weight=4)
+            blocker = bulk.submit(gate.wait)
+            futures = [bulk.submit(record, "bulk") for _ in range(10)]
+            futures += [
+                interactive.submit(record, "interactive") for _ in range(8)
+            ]
+            gate.set()
+            for future in [blocker, *futures]:
+                future.result()
+        self.assertGreaterEqual(order[:5].count("interactive"), 4)
+        self.assertEqual(order.count("interactive"), 8)
+
+
+    def test_priority_and_downstream_first(self):
+        order = list()
+        gate = threading.Event()
+        with Scheduler(max_workers=1, downstream_first=True) as scheduler:
+            upstream = scheduler.client(stage=0)
+            downstream = scheduler.client(stage=1)
+            urgent = scheduler.client(stage=0, priority=lambda x: x)
+            blocker = upstream.submit(gate.wait)
+            futures = [
+                upstream.submit(order.append, "upstream"),
+                downstream.submit(order.append, "downstream"),
+                urgent.submit(order.append, 5),
+            ]
+            gate.set()
+            for future in [blocker, *futures]:
+                future.result()
+        self.assertEqual(order, [5, "downstream", "upstream"])
+
+
+    def test_completed_futures_do_not_recurse(self):
+        executor = InlineExecutor()
+        scheduler = Scheduler(executor=executor, max_in_flight=1)
+        client = scheduler.client()
+        futures = [client.submit(abs, -i) for i in range(5000)]
+        executor.release()
+        self.assertEqual(
+            [future.result(timeout=1) for future in futures], list(range(5000))
+        )
+
+
+    def test_pooler_with_client(self):
+        with Scheduler(max_workers=2) as scheduler:
+            iterable = [(lambda x: x + 1, i, list(), dict()) for i in range(20)]
+            p = ThreadPooler(executor=scheduler.client("a"))
+            self.assertEqual(sorted(p(iterable=iterable)), list(range(1, 21)))
+            q = BlockingThreadPooler(
+                executor=scheduler.client("b"), queue_size=4
+            )
+            self.assertEqual(sorted(q(iterable=iterable)), list(range(1, 21)))
+
+
+if __name__ == "__main__":
+    unittest.main()
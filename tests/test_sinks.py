@@ -0,0 +1,82 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from light_pipe import FileSink, SQLiteSink, make_data, make_sink
+
+
+class TestSinks(unittest.TestCase):
+    @staticmethod
+    @make_data
+    def gen(x: int, delay: float = 0.0):
+        for i in range(x):
+            if delay:
+                time.sleep(delay)
+            yield i
+
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+    def test_sqlite_sink(self):
+        database = os.path.join(self.tmpdir.name, "out.db")
+        with sqlite3.connect(database) as conn:
+            conn.execute("CREATE TABLE items (x INTEGER, y INTEGER)")
+        sink = SQLiteSink(
+            database, "INSERT INTO items VALUES (?, ?)",
+            params_fn=lambda x: (x, x ** 2), max_items=100
+        )
+        results = (self.gen() >> sink)(x=1050, block=True)
+        self.assertEqual(results, list(range(1050)))
+        conn = sqlite3.connect(database)
+        self.assertEqual(
+            conn.execute("SELECT COUNT(*), SUM(y) FROM items").fetchone(),
+            (1050, sum(x ** 2 for x in range(1050)))
+        )
+        conn.close()
+        self.assertEqual(sink.metrics.counters["batches_written"], 11)
+        self.assertEqual(sink.metrics.counters["items_written"], 1050)
+        self.assertEqual(sink.metrics.count("flush_latency"), 11)
+
+
+    def test_file_sink_by_bytes(self):
+        path = os.path.join(self.tmpdir.name, "out.txt")
+        sink = FileSink(path, mode="w", max_items=None, max_bytes=1000)
+        (self.gen() >> sink)(x=500, block=True)
+        with open(path) as f:
+            self.assertEqual(f.read().split(), [str(i) for i in range(500)])
+        self.assertGreater(sink.metrics.counters["batches_written"], 1)
+
+
+    def test_time_based_flush(self):
+        batches = list()
+        sink = make_sink(batches.append)(max_items=None, max_seconds=0.05)
+        data = self.gen() >> sink
+        data(x=10, delay=0.02, block=True)
+        self.assertGreater(len(batches), 1)
+        self.assertEqual(sum(batches, []), list(range(10)))
+
+
+    def test_errors_propagate(self):
+        def fail(batch):
+            raise ValueError("failed")
+
+
+        for background in (True, False):
+            sink = make_sink(fail)(max_items=5, background=background)
+            with self.assertRaises(ValueError):
+                (self.gen() >> sink)(x=100, block=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from light_pipe import ExternalSort, make_data
+from light_pipe import sort
+
+
+def morton_key(item: tuple):
+    x, y = item
+    code = 0
+    for bit in range(16):
+        code |= ((x >> bit) & 1) << (2 * bit) | ((y >> bit) & 1) << (2 * bit + 1)
+    return code
+
+
+class TestExternalSort(unittest.TestCase):
+    @staticmethod
+    @make_data
+    def gen(x: int, seed: int = 0):
+        rng = random.Random(seed)
+        for _ in range(x):
+            yield (rng.randrange(1 << 16), rng.randrange(1 << 16))
+
+
+    def test_spilled_runs(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data = self.gen() >> ExternalSort(
+                key=morton_key, max_items=100, tmp_dir=tmp_dir
+            )
+            results = data(x=1234, block=True)
+            self.assertEqual(
+                results, sorted(self.gen()(x=1234, block=True), key=morton_key)
+            )
+            self.assertEqual(os.listdir(tmp_dir), [])
+
+
+    def test_merge_fan_in(self):
+        open_runs = [0, 0] # [current, max]
+        read_run = sort._read_run
+
+
+        def counting_read_run(path: str):
+            open_runs[0] += 1
+            open_runs[1] = max(open_runs)
+            try:
+                yield from read_run(path)
+            finally:
+                open_runs[0] -= 1
+
+
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+            mock.patch.object(sort, "_read_run", counting_read_run):
+            data = self.gen() >> ExternalSort(
+                max_items=10, merge_fan_in=4, chunk_size=7, tmp_dir=tmp_dir
+            )
+            results = data(x=1234, block=True)
+            self.assertEqual(results, sorted(self.gen()(x=1234, block=True)))
+            self.assertLessEqual(open_runs[1], 4)
+            self.assertEqual(os.listdir(tmp_dir), [])
+
+
+    def test_parallel_runs_and_reverse(self):
+        data = self.gen() >> ExternalSort(
+            memory_budget=10_000, max_workers=2, reverse=True
+        )
+        results = data(x=2000, block=True)
+        self.assertEqual(
+            results, sorted(self.gen()(x=2000, block=True), reverse=True)
+        )
+
+
+    def test_in_memory(self):
+        data = self.gen() >> ExternalSort(max_items=100)
+        self.assertEqual(
+            data(x=50, block=True), sorted(self.gen()(x=50, block=True))
+        )
+        data = self.gen() >> ExternalSort(max_items=10)
+        self.assertEqual(data(x=0, block=True), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import json
+import os
+import tempfile
+import unittest
+
+from light_pipe import (ProcessPooler, iter_lines, make_transformer,
+                        read_glob, read_jsonl, read_lines, read_records,
+                        split_file)
+
+
+def count_lines(path: str, start: int, end: int):
+    return [bytes(line) for line in iter_lines(path, start, end)]
+
+
+class TestSources(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.lines = [f"line {i} " * (i % 7) for i in range(1000)]
+        self.path = os.path.join(self.tmpdir.name, "lines.txt")
+        with open(self.path, "w") as f:
+            f.write("\n".join(self.lines))
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+    def test_read_lines(self):
+        expected = [line.encode() for line in self.lines]
+        for use_mmap in (True, False):
+            lines = [
+                bytes(line) for line in read_lines(
+                    self.path, block_size=100, read_ahead=2, use_mmap=use_mmap
+                )
+            ]
+            self.assertEqual(lines, expected)
+
+
+    def test_byte_range_shards(self):
+        expected = [line.encode() for line in self.lines]
+        size = os.path.getsize(self.path)
+        for use_mmap in (True, False):
+            for num_shards in (1, 3, 17):
+                step = -(-size // num_shards)
+                lines = list()
+                for start in range(0, size, step):
+                    lines.extend(
+                        bytes(line) for line in read_lines(
+                            self.path, byte_range=(start, start + step),
+                            block_size=64, use_mmap=use_mmap
+                        )
+                    )
+                self.assertEqual(lines, expected)
+
+
+    def test_process_pooler_over_shards(self):
+        data = split_file(self.path, num_shards=4) >> make_transformer(
+            count_lines
+        )(parallelizer=ProcessPooler(max_workers=2))
+        lines = sorted(line for shard in data(block=True) for line in shard)
+        self.assertEqual(lines, sorted(line.encode() for line in self.lines))
+
+
+    def test_read_jsonl_and_records(self):
+        path = os.path.join(self.tmpdir.name, "records.jsonl")
+        records = [{"i": i, "s": "x" * i} for i in range(200)]
+        with open(path, "w") as f:
+            f.write("\n".join(json.dumps(r) for r in records) + "\n")
+        self.assertEqual(list(read_jsonl(path, block_size=128)), records)
+
+        path = os.path.join(self.tmpdir.name, "records.bin")
+        with open(path, "wb") as f:
+            f.write(bytes(range(256)) * 4)
+        for use_mmap in (True, False):
+            records = list(
+                read_records(
+                    path, record_size=16, block_size=40, use_mmap=use_mmap
+                )
+            )
+            self.assertEqual(len(records), 64)
+            self.assertIsInstance(records[0], memoryview)
+            self.assertEqual(bytes(records[1]), bytes(range(16, 32)))
+            shard = list(
+                read_records(path, record_size=16, byte_range=(10, 40))
+            )
+            self.assertEqual(
+                [bytes(r) for r in shard],
+                [bytes(range(16, 32)), bytes(range(32, 48))]
+            )
+
+
+    def test_read_glob(self):
+        other = os.path.join(self.tmpdir.name, "other.txt")
+        with open(other, "w") as f:
+            f.write("a\nb\n")
+        paths = list(read_glob(os.path.join(self.tmpdir.name, "*.txt")))
+        self.assertEqual(paths, sorted([self.path, other]))
+        lines = list(
+            read_glob(os.path.join(self.tmpdir.name, "o*.txt"), reader=iter_lines)
+        )
+        self.assertEqual([bytes(line) for line in lines], [b"a", b"b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -46,6 +46,11 @@ class TestTransformers(unittest.TestCase):
         # self.assertEqual(results, [2,5,8])
         for result in results:
             self.assertIn(result, [2,5,8])
+
+
+    def test_default_parallelizer_not_shared(self):
+        first, second = self.get_third(), self.get_third()
+        self.assertIsNot(first.parallelizer, second.parallelizer)
     
 
 if __name__ == "__main__":
@@ -0,0 +1,67 @@
+__author__ = "Richard Correro (richard@richardcorrero.com)"
+
+
+import itertools
+import operator
+import unittest
+
+from light_pipe import CountWindow, Data, TimeWindow, WindowResult, make_data
+
+
+class TestWindows(unittest.TestCase):
+    @staticmethod
+    @make_data
+    def readings():
+        # An unbounded sensor feed.
+        for i in itertools.count():
+            yield {"t": i * 0.5, "value": i}
+
+
+    def test_count_windows(self):
+        tumbling = CountWindow(size=3, initial=int, accumulate=operator.add)
+        results = list(Data(range(8)) | tumbling)
+        self.assertEqual(
+            results, [
+                WindowResult(0, 3, 3, 3), WindowResult(3, 6, 12, 3),
+                WindowResult(6, 8, 13, 2)
+            ]
+        )
+
+        sliding = CountWindow(size=3, slide=2, emit_partial=False)
+        self.assertEqual(
+            [w.value for w in Data(range(7)) | sliding],
+            [[0, 1, 2], [2, 3, 4], [4, 5, 6]]
+        )
+
+
+    def test_time_windows_on_unbounded_stream(self):
+        window = TimeWindow(
+            size=2.0, timestamp=lambda r: r["t"], initial=int,
+            accumulate=lambda acc, r: acc + r["value"]
+        )
+        results = list(itertools.islice(self.readings() | window, 3))
+        self.assertEqual(
+            [(w.start, w.end, w.value, w.count) for w in results],
+            [(0.0, 2.0, 6, 4), (2.0, 4.0, 22, 4), (4.0, 6.0, 38, 4)]
+        )
+
+
+    def test_sliding_time_windows_with_lateness(self):
+        events = [1.0, 2.5, 1.5, 4.0, 0.5, 6.0]
+        window = TimeWindow(
+            size=2.0, slide=1.0, timestamp=float, lateness=1.0,
+            finalize=sorted
+        )
+        results = list(Data(events) | window)
+        self.assertEqual(
+            [(w.start, w.value) for w in results], [
+                (0.0, [1.0, 1.5]), (1.0, [1.0, 1.5, 2.5]), (2.0, [2.5]),
+                (3.0, [4.0]), (4.0, [4.0]), (5.0, [6.0]), (6.0, [6.0])
+            ]
+        )
+        # 0.5 arrived after the watermark passed the end of [0, 2).
+        self.assertEqual(window.metrics.counters["late_items"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()